@@ -2,6 +2,7 @@ import streamlit as st
 
 from datetime import date
 from get_data import get_stations, get_data
+from scheduler import scheduler, watch
 from tabs.model_training import model_training_page
 from tabs.occupancy_prediction import occupancy_prediction_page
 from tabs.plots import plots_page
@@ -16,6 +17,11 @@ station = st.selectbox(
     options=get_stations(),
     format_func=lambda e: f"{e['sname']}",
 )
+
+# Sync and retraining of the selected station happen in the background
+scheduler.start()
+watch(station["scode"])
+
 start_date = str(st.date_input("Start Date", value=date.today()))
 end_date = str(st.date_input("End Date", value=date.today()))
 if start_date > end_date:
@@ -34,7 +40,7 @@ predict_tab, train_tab, plots_tab = st.tabs(
 )
 
 with predict_tab:
-    occupancy_prediction_page()
+    occupancy_prediction_page(station)
 with train_tab:
     model_training_page(station, start_date, end_date)
 with plots_tab:
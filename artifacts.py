@@ -0,0 +1,103 @@
+import os
+import sys
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from features import FEATURE_VERSION
+
+# Bump whenever the artifact layout or the feature pipeline changes
+FORMAT_VERSION = 1
+
+
+def library_versions():
+    return {
+        "python": f"{sys.version_info.major}.{sys.version_info.minor}",
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def build_artifact(
+    model, feature_cols, station_code=None, data_range=None, metrics=None
+):
+    """Bundle the estimator with everything needed to check it before use"""
+    if data_range is not None:
+        data_range = [str(pd.Timestamp(value)) for value in data_range]
+
+    return {
+        "format_version": FORMAT_VERSION,
+        "feature_version": FEATURE_VERSION,
+        "estimator": model,
+        "backend": getattr(model, "name", type(model).__name__),
+        "feature_cols": list(feature_cols),
+        "station_code": None if station_code is None else str(station_code),
+        "data_range": data_range,
+        "metrics": metrics or {},
+        "versions": library_versions(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def save_artifact(artifact, path, compress=0):
+    """Write the artifact, uncompressed by default so it can be memory-mapped"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Swap the file in atomically so readers never load half an artifact
+    tmp_path = f"{path}.tmp"
+    joblib.dump(artifact, tmp_path, compress=compress)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path, station_code=None, mmap_mode="r"):
+    """Load and validate an artifact
+
+    With mmap_mode="r" the numpy arrays inside the estimator (for example the
+    node arrays of histogram gradient boosting) are memory-mapped, so worker
+    processes share one copy in the page cache. sklearn copies random forest
+    trees into its own buffers on load, those still cost one copy per process.
+    """
+    artifact = joblib.load(path, mmap_mode=mmap_mode)
+    check_artifact(artifact, station_code)
+    return artifact
+
+
+def check_artifact(artifact, station_code=None):
+    if not isinstance(artifact, dict) or "estimator" not in artifact:
+        raise ValueError("Not a model artifact, retrain the model")
+
+    if artifact["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Model artifact has format {artifact['format_version']}, "
+            f"expected {FORMAT_VERSION}, retrain the model"
+        )
+
+    if artifact["feature_version"] != FEATURE_VERSION:
+        raise ValueError(
+            f"Model was trained on feature version {artifact['feature_version']}, "
+            f"features are now version {FEATURE_VERSION}, retrain the model"
+        )
+
+    # Pickled estimators are only guaranteed to work with the sklearn they came from
+    trained_with = artifact["versions"]["sklearn"]
+    if _minor_version(trained_with) != _minor_version(sklearn.__version__):
+        raise ValueError(
+            f"Model was trained with scikit-learn {trained_with}, "
+            f"running {sklearn.__version__}, retrain the model"
+        )
+
+    if station_code is not None and artifact["station_code"] != str(station_code):
+        raise ValueError(
+            f"Model artifact belongs to station {artifact['station_code']}, "
+            f"not {station_code}"
+        )
+
+
+def _minor_version(version):
+    return tuple(version.split(".")[:2])
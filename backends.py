@@ -0,0 +1,242 @@
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from artifacts import build_artifact, load_artifact, save_artifact
+
+DEFAULT_BACKEND = os.environ.get("MODEL_BACKEND", "rf")
+# Trees grown between two progress reports
+PROGRESS_TREES = 10
+
+
+class ModelBackend:
+    """Common fit / predict / save / load contract of every model backend
+
+    Backends are pickled into the model artifact as the estimator, so
+    everything that loads a model keeps calling model.predict(X) as before.
+    """
+
+    name = None
+    # Whether update() can fold new rows into the fitted model
+    incremental = False
+
+    def __init__(self, **params):
+        self.params = params
+        self.estimator = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def fit(self, X, y, progress=None):
+        """progress(fraction) is called as fitting advances, it may raise to abort"""
+        self.estimator = self.build()
+        self.estimator.fit(X, y)
+        if progress is not None:
+            progress(1.0)
+        return self
+
+    def update(self, X, y):
+        raise NotImplementedError(f"{self.name} models can only be refit")
+
+    def predict(self, X):
+        return self.estimator.predict(X)
+
+    def score(self, X, y):
+        return self.estimator.score(X, y)
+
+    @property
+    def feature_importances_(self):
+        # Only some estimators have importances, callers check for None
+        return getattr(self.estimator, "feature_importances_", None)
+
+    def save(
+        self, path, feature_cols, station_code=None, data_range=None, metrics=None
+    ):
+        artifact = build_artifact(
+            self, feature_cols, station_code, data_range=data_range, metrics=metrics
+        )
+        save_artifact(artifact, path)
+        return path
+
+    @staticmethod
+    def load(path, station_code=None):
+        artifact = load_artifact(path, station_code)
+        return artifact["estimator"], artifact["feature_cols"]
+
+
+class RandomForestBackend(ModelBackend):
+    name = "rf"
+    incremental = True
+
+    def build(self):
+        params = {"n_estimators": 100, "random_state": 42, **self.params}
+        return RandomForestRegressor(**params)
+
+    def fit(self, X, y, progress=None):
+        if progress is None:
+            return super().fit(X, y)
+
+        # Grow the forest a few trees at a time, with the same random_state this
+        # ends up with exactly the trees of a single fit
+        forest = self.estimator = self.build()
+        n_trees = forest.n_estimators
+        forest.set_params(warm_start=True)
+        for n in range(PROGRESS_TREES, n_trees + PROGRESS_TREES, PROGRESS_TREES):
+            forest.set_params(n_estimators=min(n, n_trees))
+            forest.fit(X, y)
+            progress(forest.n_estimators / n_trees)
+        forest.set_params(warm_start=False)
+        return self
+
+    def update(self, X, y, add_trees=10, max_trees=200):
+        """Grow add_trees new trees on X, y (the recent rows), dropping the oldest
+        trees beyond max_trees, so the forest slides along with the data
+        """
+        forest = self.estimator
+        n_trees = len(forest.estimators_)
+        forest.set_params(warm_start=True, n_estimators=n_trees + add_trees)
+        forest.fit(X, y)
+
+        forest.estimators_ = forest.estimators_[-max_trees:]
+        forest.set_params(warm_start=False, n_estimators=len(forest.estimators_))
+        return self
+
+
+class CompactForestBackend(RandomForestBackend):
+    # Fewer, shallower trees: a fraction of the size and latency of "rf"
+    name = "rf_compact"
+
+    def build(self):
+        params = {
+            "n_estimators": 30,
+            "max_depth": 12,
+            "min_samples_leaf": 5,
+            "random_state": 42,
+            **self.params,
+        }
+        return RandomForestRegressor(**params)
+
+
+class HistGradientBoostingBackend(ModelBackend):
+    # Features are binned into at most 255 uint8 bins, the trees split on bins
+    name = "hgb"
+
+    def build(self):
+        params = {"max_iter": 200, "random_state": 42, **self.params}
+        return HistGradientBoostingRegressor(**params)
+
+
+class LinearBackend(ModelBackend):
+    name = "linear"
+
+    def build(self):
+        return make_pipeline(StandardScaler(), Ridge(**self.params))
+
+
+class SeasonalBackend(ModelBackend):
+    """Average target per (day of week, hour), ignores the current readings"""
+
+    name = "seasonal"
+    keys = ["day_of_week", "hour"]
+
+    def fit(self, X, y, progress=None):
+        self.estimator = (
+            pd.Series(np.asarray(y, dtype=float), index=X.index)
+            .groupby([X[key] for key in self.keys])
+            .mean()
+        )
+        self.fallback = float(np.mean(y))
+        if progress is not None:
+            progress(1.0)
+        return self
+
+    def predict(self, X):
+        index = pd.MultiIndex.from_frame(X[self.keys])
+        return self.estimator.reindex(index).fillna(self.fallback).to_numpy()
+
+    def score(self, X, y):
+        y = np.asarray(y, dtype=float)
+        residual = np.sum((y - self.predict(X)) ** 2)
+        return 1 - residual / np.sum((y - y.mean()) ** 2)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in [
+        RandomForestBackend,
+        CompactForestBackend,
+        HistGradientBoostingBackend,
+        LinearBackend,
+        SeasonalBackend,
+    ]
+}
+
+
+def get_backend(name=None, **params):
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend {name}, use one of {list(BACKENDS)}")
+    return BACKENDS[name](**params)
+
+
+def benchmark(df, feature_cols, backends=None, holdout=0.2, latency_rows=1000):
+    """Fit time, prediction latency, artifact size and MAE of every backend
+
+    The last `holdout` of the rows (in time) is held out, so the MAE is
+    measured on data after everything the model was trained on.
+    """
+    clean_df = df.dropna(subset=feature_cols + ["target"]).sort_values("mvalidtime")
+    split = int(len(clean_df) * (1 - holdout))
+    X, y = clean_df[feature_cols], clean_df["target"]
+    X_train, X_val, y_train, y_val = X[:split], X[split:], y[:split], y[split:]
+
+    results = []
+    for name in backends or BACKENDS:
+        model = get_backend(name)
+
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        # Single-row latency is what one prediction request pays
+        single = X_val.iloc[:1]
+        start = time.perf_counter()
+        for _ in range(20):
+            model.predict(single)
+        single_ms = (time.perf_counter() - start) / 20 * 1000
+
+        batch = X_val.iloc[:latency_rows]
+        start = time.perf_counter()
+        model.predict(batch)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+
+        results.append(
+            {
+                "backend": name,
+                "fit_seconds": fit_seconds,
+                "predict_1_ms": single_ms,
+                f"predict_{len(batch)}_ms": batch_ms,
+                "size_kb": buffer.tell() / 1024,
+                "val_mae": float(np.mean(np.abs(model.predict(X_val) - y_val))),
+            }
+        )
+
+    return pd.DataFrame(results).sort_values("val_mae").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from task2 import create_features, get_feature_cols, load_data
+
+    df = create_features(load_data())
+    print(benchmark(df, get_feature_cols(df)).to_string(index=False))
@@ -0,0 +1,251 @@
+"""Benchmarks of ingestion, loading, feature engineering, training and prediction
+
+Runs offline: synthetic stations shaped like parking.csv are served by a local
+stub of the ODH API, and everything is written to a temporary directory.
+Results are printed and saved as JSON in benchmarks/results/, pass one of
+those files to --compare to see how a change moved each stage.
+
+    python benchmarks/run.py --stations 8 --days 90
+    python benchmarks/run.py --memory
+    python benchmarks/run.py --compare benchmarks/results/<earlier run>.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from artifacts import library_versions
+from stub_api import StubApi
+from synthetic import END, synthetic_stations
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def measure(func, rows=None, memory=False):
+    """Run func once, returns its result and the stage's timing and peak memory
+
+    Tracing allocations slows pandas heavy code down several times, compare
+    timings only between runs with the same --memory setting. Allocations
+    made in C outside numpy (e.g. sklearn's tree nodes) are not traced.
+    """
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    stats = {"seconds": seconds}
+    if memory:
+        stats["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    if rows is not None:
+        stats["rows"] = rows
+        stats["rows_per_second"] = rows / seconds if seconds else None
+    return result, stats
+
+
+def latencies(func, calls):
+    timings = []
+    for args in calls:
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.array(timings)
+    return {
+        "calls": len(timings),
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+
+def run(args):
+    readings = synthetic_stations(args.template, args.stations, args.days, args.seed)
+    # Plain dates, the way the app passes them
+    start_date = str((END - pd.Timedelta(days=args.days)).date())
+    end_date = str(END.date())
+
+    api = StubApi(readings).start()
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="parking-bench-") as workdir:
+            os.environ["ODH_API_URL"] = f"{api.url}/v2"
+            os.environ["ODH_TOKEN_URL"] = f"{api.url}/token"
+            os.environ["PARKING_STORE"] = os.path.join(workdir, "parking.sqlite")
+            # Models, caches and the data file land in the temporary directory,
+            # which is removed with everything in it afterwards
+            os.chdir(workdir)
+            try:
+                print(f"Working in {workdir}, stub API at {api.url}")
+                stages = run_stages(args, readings, api, start_date, end_date)
+            finally:
+                os.chdir(cwd)
+    finally:
+        api.stop()
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "stations": args.stations,
+            "days": args.days,
+            "backend": args.backend or "default",
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "memory": args.memory,
+        },
+        "versions": library_versions(),
+        "stages": stages,
+    }
+
+
+def run_stages(args, readings, api, start_date, end_date):
+    station_codes = sorted(readings["scode"].unique())
+    memory = args.memory
+
+    # Imported only now, the modules read the API URLs and store path on import
+    from downloader import download_many
+    from features import create_features
+    from get_data import get_data
+    from parking_file import DATA_PATH, to_typed
+    from store import store
+    from task2 import load_data, predict_batch, predict_future, train_model
+
+    stages = {}
+
+    failed, stages["ingest"] = measure(
+        lambda: download_many(station_codes, start_date, end_date),
+        rows=len(readings),
+        memory=memory,
+    )
+    if failed:
+        raise RuntimeError(f"{len(failed)} chunks failed against the stub API")
+    stages["ingest"]["requests"] = api.requests
+
+    # Everything below is local, get_data finds the window covered in the store
+    station_code = station_codes[0]
+    _, stages["get_data"] = measure(
+        lambda: get_data(station_code, start_date, end_date, output_path=DATA_PATH),
+        rows=len(readings) // len(station_codes),
+        memory=memory,
+    )
+    _, stages["load_data"] = measure(
+        load_data, rows=len(readings) // len(station_codes), memory=memory
+    )
+    last_week = END - pd.Timedelta(days=7)
+    _, stages["load_data_last_week"] = measure(
+        lambda: load_data(start_date=last_week), memory=memory
+    )
+
+    def load_all():
+        frames = []
+        for code in station_codes:
+            df = store.load(code, start_date, end_date)
+            df.insert(0, "scode", code)
+            frames.append(df)
+        return to_typed(pd.concat(frames, ignore_index=True))
+
+    df, stages["store_load_all"] = measure(load_all, rows=len(readings), memory=memory)
+
+    df_features, stages["create_features"] = measure(
+        lambda: create_features(df), rows=len(df), memory=memory
+    )
+
+    (model, feature_cols, metrics), stages["train_model"] = measure(
+        lambda: train_model(df_features, return_metrics=True, backend=args.backend),
+        rows=len(df_features),
+        memory=memory,
+    )
+    stages["train_model"]["val_mae"] = metrics["val_mae"]
+
+    # One station's frame, the way the app and the server predict
+    station_features = df_features[df_features["scode"] == station_code]
+    last_time = station_features["mvalidtime"].max()
+    offsets = [pd.Timedelta(hours=1), pd.Timedelta(hours=3), pd.Timedelta(days=2)]
+    calls = [
+        (station_features, model, feature_cols, last_time + offsets[i % len(offsets)])
+        for i in range(args.repeat)
+    ]
+    stages["predict_future"] = latencies(predict_future, calls)
+
+    prediction_times = pd.date_range(last_time, periods=24, freq="1h")
+    _, stages["predict_batch"] = measure(
+        lambda: predict_batch(df_features, model, feature_cols, prediction_times),
+        rows=len(station_codes) * len(prediction_times),
+        memory=memory,
+    )
+
+    return stages
+
+
+def print_results(results, baseline=None):
+    print()
+    for name, stats in results["stages"].items():
+        line = f"{name:<22}"
+        if "seconds" in stats:
+            line += f" {stats['seconds'] * 1000:10.1f} ms"
+        else:
+            line += f" p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms"
+            line += f", p99 {stats['p99_ms']:.1f} ms"
+        if stats.get("rows_per_second"):
+            line += f" {stats['rows_per_second']:14,.0f} rows/s"
+        if "peak_mb" in stats:
+            line += f" {stats['peak_mb']:9.1f} MB peak"
+
+        previous = (baseline or {}).get("stages", {}).get(name)
+        if previous:
+            key = "seconds" if "seconds" in stats else "p50_ms"
+            if previous.get(key):
+                line += f"  x{stats[key] / previous[key]:.2f} vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=4)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--backend", default=None, help="model backend to train")
+    parser.add_argument("--repeat", type=int, default=30, help="predict_future calls")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--template", default=os.path.join(ROOT, "parking.csv"))
+    parser.add_argument("--output", help="results file, default benchmarks/results/")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument(
+        "--memory", action="store_true", help="trace peak memory (slows stages down)"
+    )
+    args = parser.parse_args()
+
+    # Resolved before run() changes into its temporary directory
+    args.template = os.path.abspath(args.template)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    output = args.output and os.path.abspath(args.output)
+
+    results = run(args)
+    print_results(results, baseline)
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
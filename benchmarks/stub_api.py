@@ -0,0 +1,101 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import pandas as pd
+
+MEASUREMENTS_PATH = re.compile(
+    r"^/v2/flat/ParkingStation/free,occupied/(?P<start>[^/]+)/(?P<end>[^/]+)$"
+)
+STATION_CODE = re.compile(r'"([^"]+)"')
+
+
+class StubApi:
+    """Local stand-in for the token and measurement endpoints of the ODH API
+
+    Serves the readings of a synthetic_stations frame in the flat format the
+    downloader parses, so the ingestion path runs offline and repeatably.
+    """
+
+    def __init__(self, readings):
+        # One long frame per station, times already formatted like the API does
+        long = readings.melt(
+            id_vars=["scode", "mvalidtime"],
+            value_vars=["free", "occupied"],
+            var_name="tname",
+            value_name="mvalue",
+        ).sort_values(["scode", "mvalidtime"])
+        long["time"] = long["mvalidtime"]
+        long["mvalidtime"] = long["mvalidtime"].dt.strftime(
+            "%Y-%m-%d %H:%M:%S.000+0000"
+        )
+        self.stations = {code: df for code, df in long.groupby("scode")}
+
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def measurements(self, path, query):
+        match = MEASUREMENTS_PATH.match(path)
+        if match is None:
+            return None
+
+        start = pd.Timestamp(match["start"], tz="UTC")
+        end = pd.Timestamp(match["end"], tz="UTC")
+        params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+        codes = STATION_CODE.findall(unquote(params.get("where", "")))
+        columns = params.get("select", "mvalue,mvalidtime,tname").split(",")
+
+        frames = []
+        for code in codes:
+            df = self.stations.get(code)
+            if df is not None:
+                frames.append(df[(df["time"] >= start) & (df["time"] < end)])
+        if not frames:
+            return []
+
+        return pd.concat(frames)[columns].to_dict(orient="records")
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._send({"access_token": "benchmark", "expires_in": 3600})
+
+            def do_GET(self):
+                api.requests += 1
+                url = urlparse(self.path)
+                data = api.measurements(url.path, url.query)
+                if data is None:
+                    self.send_error(404)
+                    return
+                self._send({"data": data})
+
+            def _send(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
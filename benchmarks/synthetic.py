@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# Series end here, a fixed date keeps runs with the same settings identical
+END = pd.Timestamp("2025-04-08", tz="UTC")
+FREQ = "5min"
+
+
+def weekly_profile(template):
+    """Occupancy share per 5-minute slot of the week, learned from a real series"""
+    df = pd.read_csv(template)
+    df.columns = ["mvalidtime", "free", "occupied"]
+    times = pd.to_datetime(df["mvalidtime"], utc=True)
+    share = df["occupied"] / (df["free"] + df["occupied"])
+
+    slot = _week_slot(pd.DatetimeIndex(times).floor(FREQ))
+    profile = share.groupby(np.asarray(slot)).mean()
+
+    # Slots the template never saw take the neighbouring values
+    full = pd.Series(np.nan, index=np.arange(7 * 24 * 12))
+    full.loc[profile.index] = profile.to_numpy()
+    return full.interpolate(limit_direction="both").to_numpy()
+
+
+def synthetic_stations(template, n_stations, days, seed=42):
+    """Readings of n_stations stations over days, one row per (station, 5 minutes)
+
+    Every station follows the template's weekly shape with its own capacity,
+    level, time shift and noise. Returns scode, mvalidtime, free, occupied.
+    """
+    rng = np.random.default_rng(seed)
+    profile = weekly_profile(template)
+    times = pd.date_range(end=END, periods=days * 24 * 12, freq=FREQ, inclusive="left")
+    slot = _week_slot(times)
+
+    frames = []
+    for i in range(n_stations):
+        capacity = int(rng.integers(50, 1500))
+        shift = int(rng.integers(-6, 7))
+        level = rng.uniform(0.7, 1.2)
+
+        share = np.roll(profile, shift)[slot] * level
+        share += rng.normal(0, 0.02, len(times))
+        occupied = np.clip(np.round(share * capacity), 0, capacity).astype(int)
+
+        frames.append(
+            pd.DataFrame(
+                {
+                    "scode": f"bench-{i}",
+                    "mvalidtime": times,
+                    "free": capacity - occupied,
+                    "occupied": occupied,
+                }
+            )
+        )
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _week_slot(times):
+    return times.dayofweek * 288 + times.hour * 12 + times.minute // 5
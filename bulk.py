@@ -0,0 +1,111 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from downloader import download_many
+from get_data import get_stations
+from model_registry import MODELS_DIR, registry as model_registry
+from store import store
+from task2 import prepare_data, create_features, train_model
+
+REGISTRY_PATH = os.path.join(MODELS_DIR, "registry.json")
+
+
+def refresh_all(start_date, end_date, origin="FAMAS", max_workers=None):
+    """Fetch and retrain every station of an origin, the nightly job entry point"""
+    station_codes = [
+        station["scode"]
+        for station in get_stations()
+        if station.get("sorigin") == origin
+    ]
+    print(f"Refreshing {len(station_codes)} {origin} stations")
+
+    failed = download_many(station_codes, start_date, end_date)
+    if failed:
+        print(f"{len(failed)} station chunks could not be fetched")
+
+    return train_stations(station_codes, start_date, end_date, max_workers)
+
+
+def train_stations(station_codes, start_date, end_date, max_workers=None):
+    """Train one model per station in a process pool and record them in the registry"""
+    registry = load_registry()
+
+    # Forests train on a single core each, so one process per station keeps
+    # every core busy
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(train_station, code, start_date, end_date): code
+            for code in station_codes
+        }
+        for future in as_completed(futures):
+            station_code = futures[future]
+            try:
+                entry = future.result()
+            except ValueError as e:
+                print(f"Skipping station {station_code}: {e}")
+                continue
+
+            if entry is not None:
+                registry[str(station_code)] = entry
+                print(f"Trained model for station {station_code}")
+
+    save_registry(registry)
+    return registry
+
+
+def train_station(station_code, start_date, end_date):
+    df = store.load(station_code, start_date, end_date)
+    if df.empty:
+        print(f"No data for station {station_code}")
+        return None
+
+    df_features = create_features(prepare_data(df))
+    model, feature_cols, metrics = train_model(df_features, return_metrics=True)
+
+    # The observed range rather than the requested one, incremental updates
+    # continue from its end
+    artifact_path = model_registry.save(
+        model,
+        feature_cols,
+        station_code,
+        data_range=(
+            df_features["mvalidtime"].min(),
+            df_features["mvalidtime"].max(),
+        ),
+        metrics=metrics,
+    )
+
+    return {
+        "artifact_path": artifact_path,
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "rows": len(df),
+        "metrics": metrics,
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def load_registry(path=REGISTRY_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_registry(registry, path=REGISTRY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write next to the registry and swap it in, readers never see half a file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    end_date = date.today()
+    start_date = end_date - timedelta(days=365)
+    refresh_all(str(start_date), str(end_date))
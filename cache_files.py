@@ -0,0 +1,32 @@
+import glob
+import os
+
+
+def touch(path):
+    """Mark a cached file as used, prune keeps it a while longer"""
+    os.utime(path)
+
+
+def prune(directory, pattern, keep):
+    """Delete all but the `keep` most recently written or touched files matching
+    pattern in directory, returns the deleted paths
+    """
+    paths = glob.glob(os.path.join(directory, pattern))
+    paths.sort(key=_mtime, reverse=True)
+
+    removed = []
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed.append(path)
+    return removed
+
+
+def _mtime(path):
+    # Another process may prune the same directory at the same time
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
@@ -0,0 +1,216 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from urllib.parse import quote
+
+import pandas as pd
+import requests
+
+import odh_client
+from odh_client import API_URL
+from store import store as default_store
+
+API_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# A week of 5-minute readings is ~4000 measurements, small enough to retry cheaply
+CHUNK_SIZE = timedelta(days=int(os.environ.get("ODH_CHUNK_DAYS", 7)))
+MAX_WORKERS = int(os.environ.get("ODH_MAX_WORKERS", 8))
+# Stations per request in bulk mode, keeps the where filter and the response bounded
+BATCH_SIZE = int(os.environ.get("ODH_BATCH_SIZE", 10))
+
+
+def split_range(start_date, end_date, chunk_size=CHUNK_SIZE):
+    """Split [start, end) into consecutive windows of at most chunk_size"""
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    chunks = []
+    while start < end:
+        chunk_end = min(start + chunk_size, end)
+        chunks.append((start, chunk_end))
+        start = chunk_end
+
+    return chunks
+
+
+def download(
+    station_code,
+    start_date,
+    end_date,
+    chunk_size=CHUNK_SIZE,
+    max_workers=MAX_WORKERS,
+    store=default_store,
+):
+    """Fetch the parts of the window the store is missing, in parallel chunks
+
+    Every finished chunk is written to the store and marked as covered right
+    away, so an interrupted download resumes where it stopped. Returns the
+    chunks that failed.
+    """
+    chunks = [
+        chunk
+        for gap_start, gap_end in store.missing_ranges(
+            station_code, start_date, end_date
+        )
+        for chunk in split_range(gap_start, gap_end, chunk_size)
+    ]
+    if not chunks:
+        return []
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_chunk, station_code, start, end, store): (start, end)
+            for start, end in chunks
+        }
+        for future in as_completed(futures):
+            start, end = futures[future]
+            try:
+                rows = future.result()
+                print(
+                    f"Fetched {start} to {end} for station {station_code} ({rows} rows)"
+                )
+            except (requests.RequestException, ValueError) as e:
+                print(f"Request failed for {start} to {end}: {e}")
+                failed.append((start, end))
+
+    return sorted(failed)
+
+
+def download_many(
+    station_codes,
+    start_date,
+    end_date,
+    batch_size=BATCH_SIZE,
+    chunk_size=CHUNK_SIZE,
+    max_workers=MAX_WORKERS,
+    store=default_store,
+):
+    """Like download, but asks for a batch of stations in a single request per chunk
+
+    Stations whose missing windows line up (the usual case for a nightly
+    refresh) share requests through a scode.in.(...) filter. Returns the
+    (station, start, end) triples that failed.
+    """
+    stations_by_chunk = defaultdict(list)
+    for station_code in station_codes:
+        for gap_start, gap_end in store.missing_ranges(
+            station_code, start_date, end_date
+        ):
+            for chunk in split_range(gap_start, gap_end, chunk_size):
+                stations_by_chunk[chunk].append(str(station_code))
+
+    requests_to_make = [
+        (codes[i : i + batch_size], start, end)
+        for (start, end), codes in stations_by_chunk.items()
+        for i in range(0, len(codes), batch_size)
+    ]
+    if not requests_to_make:
+        return []
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_batch, codes, start, end, store): (codes, start, end)
+            for codes, start, end in requests_to_make
+        }
+        for future in as_completed(futures):
+            codes, start, end = futures[future]
+            try:
+                rows = future.result()
+                print(
+                    f"Fetched {start} to {end} for {len(codes)} stations ({rows} rows)"
+                )
+            except (requests.RequestException, ValueError) as e:
+                print(f"Request failed for {start} to {end}: {e}")
+                failed.extend((code, start, end) for code in codes)
+
+    return sorted(failed)
+
+
+def _fetch_batch(station_codes, start, end, store):
+    data = (
+        odh_client.get(measurements_url(station_codes, start, end, by_station=True))
+        .json()
+        .get("data")
+    )
+    tables = to_station_tables(data)
+    del data
+
+    rows = 0
+    for station_code in station_codes:
+        # Stations without readings in the window are still covered, the API
+        # simply has nothing for them
+        df = tables.get(station_code)
+        if df is not None:
+            store.add_measurements(station_code, df)
+            rows += len(df)
+        store.mark_covered(station_code, start, end)
+
+    return rows
+
+
+def _fetch_chunk(station_code, start, end, store):
+    # Each chunk is parsed and pivoted on its own, so a year long download never
+    # holds more than one week of raw JSON in memory
+    data = odh_client.get(measurements_url(station_code, start, end)).json().get("data")
+    df = to_wide_table(data)
+    del data
+
+    store.add_measurements(station_code, df)
+    store.mark_covered(station_code, start, end)
+
+    return len(df)
+
+
+def measurements_url(station_codes, start, end, by_station=False):
+    start = pd.Timestamp(start).strftime(API_TIME_FORMAT)
+    end = pd.Timestamp(end).strftime(API_TIME_FORMAT)
+
+    if isinstance(station_codes, (str, int)):
+        station_filter = f'scode.eq."{station_codes}"'
+    else:
+        station_filter = (
+            "scode.in.(" + ",".join(f'"{code}"' for code in station_codes) + ")"
+        )
+    where = quote(f"and(sorigin.eq.FAMAS,{station_filter})", safe=".")
+    select = (
+        "mvalue,mvalidtime,tname,scode" if by_station else "mvalue,mvalidtime,tname"
+    )
+
+    return f"{API_URL}/flat/ParkingStation/free,occupied/{start}/{end}?where={where}&select={select}&limit=-1"
+
+
+def to_wide_table(data):
+    """Pivot the flat free/occupied measurements into one row per mvalidtime"""
+    measurements = pd.DataFrame.from_records(
+        data, columns=["mvalidtime", "tname", "mvalue"]
+    )
+
+    wide = (
+        measurements.drop_duplicates(["mvalidtime", "tname"], keep="last")
+        .pivot(index="mvalidtime", columns="tname", values="mvalue")
+        .reindex(columns=["free", "occupied"])
+    )
+    wide.columns.name = None
+
+    return wide.reset_index()
+
+
+def to_station_tables(data):
+    """Split a multi-station response into one wide table per scode"""
+    measurements = pd.DataFrame.from_records(
+        data, columns=["scode", "mvalidtime", "tname", "mvalue"]
+    )
+
+    wide = (
+        measurements.drop_duplicates(["scode", "mvalidtime", "tname"], keep="last")
+        .pivot(index=["scode", "mvalidtime"], columns="tname", values="mvalue")
+        .reindex(columns=["free", "occupied"])
+    )
+    wide.columns.name = None
+
+    return {
+        str(station_code): table.reset_index(level="scode", drop=True).reset_index()
+        for station_code, table in wide.groupby(level="scode")
+    }
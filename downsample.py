@@ -0,0 +1,36 @@
+import numpy as np
+
+# A Plotly chart is about 1000 px wide, a min and a max per pixel is all it can show
+MAX_POINTS = 2000
+
+
+def min_max_downsample(x, y, max_points=MAX_POINTS):
+    """Keep the lowest and the highest point of each of max_points / 2 buckets
+
+    Unlike averaging or striding this keeps every peak and trough of the
+    series, which is what the eye looks for in free space curves. Points
+    come back in their original order, missing values are dropped.
+    """
+    y = np.asarray(y, dtype=float)
+    indices = np.flatnonzero(~np.isnan(y))
+
+    n_buckets = max_points // 2
+    if len(indices) > max_points and n_buckets > 0:
+        values = y[indices]
+        # Equal-count buckets, the data is on a regular grid
+        bucket = np.arange(len(values)) * n_buckets // len(values)
+        order = np.lexsort((values, bucket))
+        starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+        ends = np.append(starts[1:], len(values)) - 1
+        indices = indices[np.unique(np.concatenate([order[starts], order[ends]]))]
+
+    # Series stay Series, tz-aware times would otherwise become Python objects
+    x = x.iloc[indices] if hasattr(x, "iloc") else np.asarray(x)[indices]
+    return x, y[indices]
+
+
+def sample(df, max_points, seed=42):
+    """Random subset of rows for scatter plots, where shape matters and order does not"""
+    if len(df) <= max_points:
+        return df
+    return df.sample(max_points, random_state=seed)
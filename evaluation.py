@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cache_files import prune, touch
+from model_registry import model_path, registry
+
+EVALUATIONS_DIR = os.path.join("data", "evaluations")
+MAX_ENTRIES = 8
+# Every new model or dataset stores another evaluation, only the most recently
+# used ones stay on disk
+MAX_FILES = 32
+
+
+def backtest(df, model, feature_cols):
+    """Prediction and residual of every row with complete features and target"""
+    clean_df = df.dropna(subset=["target"] + feature_cols)
+    predicted = model.predict(clean_df[feature_cols])
+
+    residuals = pd.DataFrame(
+        {
+            "mvalidtime": clean_df["mvalidtime"].to_numpy(),
+            "actual": clean_df["target"].to_numpy(dtype=np.float32),
+            "predicted": predicted.astype(np.float32),
+        }
+    )
+    if "scode" in clean_df.columns:
+        residuals.insert(0, "scode", clean_df["scode"].to_numpy())
+    residuals["residual"] = residuals["predicted"] - residuals["actual"]
+    return residuals
+
+
+def summarize(residuals):
+    error = residuals["residual"].to_numpy(dtype=float)
+    if len(error) == 0:
+        return {"rows": 0}
+
+    return {
+        "rows": len(error),
+        "mae": float(np.mean(np.abs(error))),
+        "rmse": float(np.sqrt(np.mean(error**2))),
+        "bias": float(np.mean(error)),
+        "p90_abs_error": float(np.percentile(np.abs(error), 90)),
+        "max_abs_error": float(np.max(np.abs(error))),
+        "start": str(residuals["mvalidtime"].min()),
+        "end": str(residuals["mvalidtime"].max()),
+    }
+
+
+class Evaluations:
+    """Backtest results stored once per (model artifact, dataset fingerprint)
+
+    Residuals go to a parquet file and metrics to a JSON file next to it, so
+    showing metrics is a dictionary or small file lookup and the model only
+    runs over the history when the model or the data changed.
+    """
+
+    def __init__(
+        self, directory=EVALUATIONS_DIR, max_entries=MAX_ENTRIES, max_files=MAX_FILES
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_files = max_files
+
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._residuals = OrderedDict()
+
+    def evaluate(self, df, fingerprint, station_code=None, name="rf"):
+        """Residuals and metrics of the registry model on df, computed on first use"""
+        key = self.key(fingerprint, station_code, name)
+
+        with self._lock:
+            residuals = self._residuals.get(key)
+            if residuals is not None:
+                self._residuals.move_to_end(key)
+                return residuals, self._metrics[key]
+
+            metrics = self._load_metrics(key)
+            if metrics is not None:
+                residuals = pd.read_parquet(self._path(key, "parquet"))
+            else:
+                model, feature_cols = registry.get(station_code, name)
+                # Keyed on the artifact actually loaded, should it just have changed
+                key = self.key(fingerprint, station_code, name)
+                residuals = backtest(df, model, feature_cols)
+                metrics = summarize(residuals)
+                self._persist(key, residuals, metrics)
+
+            self._metrics[key] = metrics
+            self._residuals[key] = residuals
+            while len(self._residuals) > self.max_entries:
+                self._residuals.popitem(last=False)
+
+            return residuals, metrics
+
+    def metrics(self, fingerprint, station_code=None, name="rf"):
+        """Stored metrics, or None when this pair was never evaluated"""
+        key = self.key(fingerprint, station_code, name)
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = self._load_metrics(key)
+            if metrics is not None:
+                self._metrics[key] = metrics
+        return metrics
+
+    def key(self, fingerprint, station_code=None, name="rf"):
+        # The artifact is identified by its path and the signature of its file
+        artifact = (
+            model_path(station_code, name),
+            *registry.version(station_code, name),
+        )
+        return hashlib.sha1(repr((fingerprint, artifact)).encode()).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def _load_metrics(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key, "json")) as f:
+                metrics = json.load(f)
+            touch(self._path(key, "json"))
+            return metrics
+        except FileNotFoundError:
+            return None
+
+    def _persist(self, key, residuals, metrics):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Residuals first, metrics existing means the parquet is complete
+        for extension, write in (
+            ("parquet", lambda path: residuals.to_parquet(path, index=False)),
+            ("json", lambda path: _write_json(metrics, path)),
+        ):
+            tmp_path = f"{self._path(key, extension)}.tmp"
+            write(tmp_path)
+            os.replace(tmp_path, self._path(key, extension))
+        self._prune()
+
+    def _prune(self):
+        # An evaluation is its metrics file and the residuals next to it.
+        # Metrics go first, a key without them is never read from disk
+        for path in prune(self.directory, "*.json", self.max_files):
+            key = os.path.splitext(os.path.basename(path))[0]
+            self._metrics.pop(key, None)
+            self._residuals.pop(key, None)
+            try:
+                os.remove(self._path(key, "parquet"))
+            except FileNotFoundError:
+                pass
+
+
+def _write_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+evaluations = Evaluations()
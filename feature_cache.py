@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import pandas as pd
+
+from cache_files import prune, touch
+from features import FEATURE_VERSION, create_features
+from forecast import PROFILE_WINDOW
+from parking_file import DATA_PATH, ensure_data
+from store import store
+from task2 import load_data, prepare_data
+
+CACHE_DIR = os.path.join("data", "features")
+MAX_ENTRIES = 8
+# Every fetch of new data persists another frame, only the most recently used
+# ones stay on disk
+MAX_FILES = 32
+# Enough history for the lags, and the weekly profile of long horizons
+HISTORY = PROFILE_WINDOW + timedelta(days=1)
+
+
+class FeatureCache:
+    """LRU cache of create_features output, keyed by data content and feature version
+
+    Frames handed out are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(
+        self, max_entries=MAX_ENTRIES, cache_dir=CACHE_DIR, max_files=MAX_FILES
+    ):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+
+        self._lock = threading.Lock()
+        self._frames = OrderedDict()
+        self._digests = {}
+
+    def get_features(self, file_path=DATA_PATH):
+        key = (self.fingerprint(file_path), FEATURE_VERSION)
+
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+                return df
+
+            df = self._load_persisted(key)
+            if df is None:
+                df = create_features(load_data(file_path))
+                self._persist(key, df)
+
+            self._frames[key] = df
+            # Evict the least recently used frames
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+
+            return df
+
+    def fingerprint(self, file_path):
+        # get_data rewrites the data file on every rerun, so hash the content
+        # rather than trusting mtime, and only rehash when mtime or size moved
+        stat = os.stat(ensure_data(file_path))
+        path = os.path.abspath(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        # Only the current version of each file is remembered
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with open(file_path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self._digests[path] = (signature, digest)
+        return digest
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def _path(self, key):
+        digest, version = key
+        return os.path.join(self.cache_dir, f"{digest}-v{version}.parquet")
+
+    def _load_persisted(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            df = pd.read_parquet(self._path(key))
+            touch(self._path(key))
+            return df
+        except FileNotFoundError:
+            return None
+
+    def _persist(self, key, df):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        tmp_path = f"{self._path(key)}.tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, self._path(key))
+        prune(self.cache_dir, "*.parquet", self.max_files)
+
+
+class StationFeatures:
+    """Latest feature rows per station, rebuilt only when the store has new readings"""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+
+        self._lock = threading.Lock()
+        self._frames = {}
+
+    def get(self, station_code):
+        # Without a station, the app's working set
+        if station_code is None:
+            return feature_cache.get_features(DATA_PATH)
+
+        latest = store.latest(station_code)
+        if latest is None:
+            raise FileNotFoundError(f"No data for station {station_code}")
+
+        with self._lock:
+            cached = self._frames.get(station_code)
+            if cached is not None and cached[0] == latest:
+                return cached[1]
+
+        start = pd.Timestamp(latest).tz_localize(None) - self.history
+        df = create_features(prepare_data(store.load(station_code, start_date=start)))
+
+        with self._lock:
+            self._frames[station_code] = (latest, df)
+        return df
+
+
+feature_cache = FeatureCache()
+station_features = StationFeatures()
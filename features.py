@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Bump whenever create_features changes, cached feature frames and model
+# artifacts are keyed on it
+FEATURE_VERSION = 2
+
+# Readings are published every 5 minutes, lags and the target are taken on that grid
+FREQ = "5min"
+N_LAGS = 12
+HORIZON = pd.Timedelta(hours=1)
+
+# Short outages (up to FILL_LIMIT missing slots) are filled, longer ones stay
+# empty so their rows drop out of training instead of getting wrong labels
+FILL_LIMIT = 3
+FILL_METHODS = ("ffill", "interpolate", None)
+
+VALUE_COLS = ["free", "occupied"]
+
+
+def resample_to_grid(df, freq=FREQ, fill_limit=FILL_LIMIT, fill_method="ffill"):
+    """Put readings on a regular grid, per station when an scode column is present"""
+    if fill_method not in FILL_METHODS:
+        raise ValueError(f"fill_method must be one of {FILL_METHODS}")
+
+    # Counts may come in as compact Int16, features are computed in float
+    indexed = df.set_index("mvalidtime").astype({col: "float64" for col in VALUE_COLS})
+    if "scode" in df.columns:
+        grid = indexed.groupby("scode")[VALUE_COLS].resample(freq).last()
+        groups = grid.groupby(level="scode")
+    else:
+        grid = indexed[VALUE_COLS].resample(freq).last()
+        groups = grid
+
+    # The last reading of a slot wins, e.g. 00:13:59 lands in the 00:10 slot
+    if fill_method == "ffill":
+        grid = groups.ffill(limit=fill_limit)
+    elif fill_method == "interpolate":
+        grid = groups.transform(
+            lambda values: values.interpolate(limit=fill_limit, limit_area="inside")
+        )
+
+    return grid.reset_index()
+
+
+# Feature engineering
+def create_features(df, freq=FREQ, fill_limit=FILL_LIMIT, fill_method="ffill"):
+    df = resample_to_grid(df, freq, fill_limit, fill_method)
+    step = pd.Timedelta(freq)
+
+    # Extract datetime features
+    df["hour"] = df["mvalidtime"].dt.hour
+    df["day_of_week"] = df["mvalidtime"].dt.dayofweek
+    df["day_of_month"] = df["mvalidtime"].dt.day
+    df["month"] = df["mvalidtime"].dt.month
+    df["year"] = df["mvalidtime"].dt.year
+
+    # On the grid every row is exactly one step after the previous one
+    df["time_diff"] = step.total_seconds()
+
+    # Lags and target are shifted per station, so they never cross into another
+    # station's series, and a shift of n rows is always n * freq in time
+    free = df.groupby("scode")["free"] if "scode" in df.columns else df["free"]
+
+    # Create lagged features (values from previous time steps)
+    lags = {f"free_lag_{i}": free.shift(i) for i in range(1, N_LAGS + 1)}
+    df = pd.concat([df, pd.DataFrame(lags)], axis=1)
+
+    # Calculate rate of change
+    df["rate_of_change"] = (df["free"] - df["free_lag_1"]) / df["time_diff"]
+
+    # Create target variable: free spaces one HORIZON later
+    df["target"] = free.shift(-(HORIZON // step))
+
+    return df
+
+
+def complete_rows(df, feature_cols):
+    """Positions of the rows that have every feature and a target"""
+    complete = df["target"].notna().to_numpy()
+    for col in feature_cols:
+        complete = complete & df[col].notna().to_numpy()
+    return np.flatnonzero(complete)
+
+
+def feature_matrix(df, feature_cols, rows):
+    """float32 design matrix and target of the given rows, in that order
+
+    Every column is written straight into one preallocated C-contiguous
+    array, the float32 sklearn's trees work in, instead of going through
+    dropna and column selection copies of the whole frame.
+    """
+    X = np.empty((len(rows), len(feature_cols)), dtype=np.float32)
+    for j, col in enumerate(feature_cols):
+        X[:, j] = df[col].to_numpy()[rows]
+    y = df["target"].to_numpy(dtype=np.float32)[rows]
+    return X, y
@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+
+from features import FREQ, HORIZON, N_LAGS
+
+# How far predict_batch rolls forward before falling back to the weekly profile.
+# On held-out days of parking.csv the recursion clearly wins for the first hours
+# and drifts further out, recursive_forecast itself has no limit
+MAX_RECURSIVE_HORIZON = pd.Timedelta(hours=6)
+# History the weekly profile beyond it is averaged over. Stations shift level
+# every few weeks, the last week follows them better than a longer average
+PROFILE_WINDOW = pd.Timedelta(days=7)
+# After the recursion hands over, the profile starts at the trajectory's last
+# value and eases back onto its own level over this long
+BLEND_WINDOW = pd.Timedelta(hours=3)
+
+
+def recursive_forecast(df, model, feature_cols, until):
+    """Roll the one-hour model forward on the 5-minute grid up to `until`
+
+    The model predicts free spaces HORIZON after each row. Starting from the
+    last observed rows, every block of one-hour-ahead predictions becomes
+    the free / lag / rate_of_change input of the next block, so each
+    model.predict call moves all stations one hour further. Returns the
+    trajectory with one row per (station, 5-minute slot) after the last
+    observation.
+    """
+    step = pd.Timedelta(FREQ)
+    block = HORIZON // step
+    # Rows needed before the first block: its oldest row plus that row's lags
+    history = block + N_LAGS
+
+    groups = df.groupby("scode") if "scode" in df.columns else [(None, df)]
+    station_codes, free_rows, occupied_rows, last_times = [], [], [], []
+    for station_code, group in groups:
+        tail = group.tail(history)
+        free = tail["free"].ffill().bfill().to_numpy(dtype=float)
+        occupied = tail["occupied"].ffill().bfill().to_numpy(dtype=float)
+        if len(free) == 0 or np.isnan(free).all():
+            continue
+
+        # Short histories are padded with their oldest reading
+        pad = history - len(free)
+        station_codes.append(station_code)
+        free_rows.append(np.pad(free, (pad, 0), mode="edge"))
+        occupied_rows.append(np.pad(occupied, (pad, 0), mode="edge"))
+        last_times.append(tail["mvalidtime"].iloc[-1])
+
+    if not last_times:
+        raise ValueError("No observations to forecast from")
+
+    last_times = pd.DatetimeIndex(last_times)
+    n_blocks = max(int(np.ceil((until - last_times.min()) / HORIZON)), 1)
+    n_steps = n_blocks * block
+
+    # (stations, time) matrices, the first `history` columns are observations
+    free = np.concatenate(
+        [np.array(free_rows), np.full((len(free_rows), n_steps), np.nan)], axis=1
+    )
+    occupied = np.concatenate(
+        [np.array(occupied_rows), np.full((len(free_rows), n_steps), np.nan)], axis=1
+    )
+    # Occupied is not predicted, it follows from the station's capacity
+    capacity = free[:, history - 1] + occupied[:, history - 1]
+
+    for b in range(n_blocks):
+        # The last `block` known columns predict the next `block` columns
+        last = history - 1 + b * block
+        columns = np.arange(last - block + 1, last + 1)
+
+        rows = _feature_rows(free, occupied, columns, last_times, history, step)
+        for col in set(feature_cols) - set(rows.columns):
+            rows[col] = 0
+        predictions = model.predict(rows[feature_cols]).reshape(len(free), block)
+        predictions = np.clip(predictions, 0, capacity[:, None])
+
+        free[:, last + 1 : last + block + 1] = predictions
+        occupied[:, last + 1 : last + block + 1] = capacity[:, None] - predictions
+
+    # Trajectory after the last observation, trimmed to `until`
+    trajectory = pd.DataFrame(
+        {
+            "mvalidtime": _grid_times(last_times, np.arange(1, n_steps + 1) * step),
+            "predicted_free": free[:, history:].ravel(),
+        }
+    )
+    if "scode" in df.columns:
+        trajectory.insert(0, "scode", np.repeat(station_codes, n_steps))
+
+    return trajectory[trajectory["mvalidtime"] <= until].reset_index(drop=True)
+
+
+def sample_trajectory(trajectory, prediction_times, query_times=None):
+    """Trajectory value in the slot each prediction time falls in
+
+    query_times are the prediction times in the data's time zone, when they
+    differ from the prediction times reported back.
+    """
+    if query_times is None:
+        query_times = prediction_times
+    times = pd.DataFrame(
+        {"prediction_time": prediction_times, "mvalidtime": query_times}
+    )
+
+    by = None
+    if "scode" in trajectory.columns:
+        stations = pd.DataFrame({"scode": trajectory["scode"].unique()})
+        times = stations.merge(times, how="cross")
+        by = "scode"
+
+    sampled = pd.merge_asof(
+        times.sort_values("mvalidtime"),
+        trajectory.sort_values("mvalidtime"),
+        on="mvalidtime",
+        by=by,
+        direction="backward",
+    )
+    return sampled.drop(columns="mvalidtime")
+
+
+def seasonal_forecast(
+    df,
+    prediction_times,
+    query_times=None,
+    window=PROFILE_WINDOW,
+    anchor=None,
+    blend_window=BLEND_WINDOW,
+):
+    """Average free spaces of every station at the weekday and hour of each
+    prediction time, over the station's last `window` in df
+
+    For times the recursion does not reach. Weekdays the history does not
+    cover take the station's average at that hour, or its overall average.
+    query_times are as in sample_trajectory.
+
+    anchor is a recursive_forecast trajectory the profile continues. At its
+    last slot the profile is shifted to meet it, the shift fades out over
+    blend_window so the forecast has no jump where the two meet.
+    """
+    if query_times is None:
+        query_times = prediction_times
+
+    observed = df[df["free"].notna()]
+    if observed.empty:
+        raise ValueError("No observations to forecast from")
+    station = observed["scode"] if "scode" in df.columns else np.zeros(len(observed))
+    last_times = observed["mvalidtime"].groupby(station).transform("max")
+    recent = (observed["mvalidtime"] > last_times - window).to_numpy()
+    observed, station = observed[recent], station[recent]
+
+    times = observed["mvalidtime"].dt
+    free = observed["free"].astype(float)
+
+    by_weekday = free.groupby([station, times.dayofweek, times.hour]).mean()
+    by_hour = free.groupby([station, times.hour]).mean()
+    overall = free.groupby(station).mean()
+
+    def profile(station_keys, times):
+        predicted = by_weekday.reindex(
+            pd.MultiIndex.from_arrays([station_keys, times.dayofweek, times.hour])
+        ).to_numpy(copy=True)
+        missing = np.isnan(predicted)
+        predicted[missing] = by_hour.reindex(
+            pd.MultiIndex.from_arrays([station_keys[missing], times.hour[missing]])
+        ).to_numpy()
+        missing = np.isnan(predicted)
+        predicted[missing] = overall.reindex(station_keys[missing]).to_numpy()
+        return predicted
+
+    # One row per (station, prediction time), station-major
+    stations = overall.index.to_numpy()
+    station_keys = stations.repeat(len(query_times))
+    positions = np.tile(np.arange(len(query_times)), len(stations))
+    row_times = query_times[positions]
+    predicted = profile(station_keys, row_times)
+
+    if anchor is not None and not anchor.empty:
+        if "scode" in anchor.columns:
+            ends = anchor.groupby("scode").tail(1).set_index("scode")
+        else:
+            ends = anchor.tail(1).set_index(np.zeros(1))
+        ends = ends.reindex(stations)
+        end_times = pd.DatetimeIndex(ends["mvalidtime"])
+        # Where the trajectory ends above or below the profile, per station
+        offset = ends["predicted_free"].to_numpy() - profile(stations, end_times)
+        offset = np.nan_to_num(offset)
+
+        elapsed = (row_times - end_times.repeat(len(query_times))) / blend_window
+        weight = np.where(elapsed > 0, np.clip(1 - elapsed, 0, 1), 0)
+        predicted += offset.repeat(len(query_times)) * np.nan_to_num(weight)
+
+    forecast = pd.DataFrame(
+        {
+            "prediction_time": prediction_times[positions],
+            "predicted_free": predicted,
+        }
+    )
+    if "scode" in df.columns:
+        forecast.insert(0, "scode", station_keys)
+
+    return forecast
+
+
+def _feature_rows(free, occupied, columns, last_times, history, step):
+    # Features of every (station, column) pair, flattened station-major
+    lags = {f"free_lag_{k}": free[:, columns - k].ravel() for k in range(1, N_LAGS + 1)}
+
+    times = _grid_times(last_times, (columns - (history - 1)) * step)
+
+    rows = pd.DataFrame(
+        {
+            "hour": times.hour,
+            "day_of_week": times.dayofweek,
+            "day_of_month": times.day,
+            "month": times.month,
+            "year": times.year,
+            "free": free[:, columns].ravel(),
+            "occupied": occupied[:, columns].ravel(),
+            **lags,
+        }
+    )
+    rows["rate_of_change"] = (rows["free"] - rows["free_lag_1"]) / step.total_seconds()
+
+    return rows
+
+
+def _grid_times(last_times, offsets):
+    # Every offset after every station's last time, flattened station-major
+    offsets = pd.TimedeltaIndex(offsets)
+    return last_times.repeat(len(offsets)) + pd.TimedeltaIndex(
+        np.tile(offsets.to_numpy(), len(last_times))
+    )
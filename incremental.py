@@ -0,0 +1,135 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+
+from features import FREQ, HORIZON, N_LAGS, create_features
+from model_registry import model_path, registry
+from parking_file import DATA_PATH
+from store import store
+from task2 import _in_time_zone, load_data, prepare_data, train_model
+
+# Trees grown per update, and the most a forest keeps (oldest dropped first)
+ADD_TREES = int(os.environ.get("ODH_UPDATE_TREES", 10))
+MAX_TREES = int(os.environ.get("ODH_MAX_TREES", 200))
+# Backends without update() are refit on this much recent history instead
+WINDOW = pd.Timedelta(days=int(os.environ.get("ODH_UPDATE_WINDOW_DAYS", 14)))
+# Fewer new labelled rows than this are left for the next update
+MIN_NEW_ROWS = 12
+
+
+def update_model(station_code=None, name="rf", file_path=DATA_PATH):
+    """Bring a saved model up to date with the readings that arrived since it was
+    trained, without refitting on the full history
+
+    The end of the artifact's data_range is the checkpoint. Incremental
+    backends grow new trees on the last WINDOW, other backends are refit on
+    it. The newest half of the rows after the checkpoint is held out, and the
+    updated model is only saved when its MAE there is no worse than the
+    current model's. The replaced artifact is kept for registry.rollback().
+    Station models read the local store, the working-dir model reads file_path.
+    """
+    artifact = registry.get_artifact(station_code, name)
+    current, feature_cols = artifact["estimator"], artifact["feature_cols"]
+    data_range = artifact["data_range"]
+    if data_range is None:
+        raise ValueError("Model has no data range to update from, retrain it")
+    trained_from, checkpoint = (pd.Timestamp(value) for value in data_range)
+
+    # The first new row needs its lags, and rows whose target was still in the
+    # future at the checkpoint only got their label now
+    first_new = checkpoint - HORIZON
+    history = first_new - N_LAGS * pd.Timedelta(FREQ)
+    df = _load(station_code, file_path, min(history, checkpoint - WINDOW))
+    if df.empty:
+        return {"station": station_code, "mode": "unchanged", "new_rows": 0}
+
+    tz = df["mvalidtime"].dt.tz
+    first_new = _in_time_zone(first_new, tz)
+    latest = df["mvalidtime"].max()
+    start = latest - WINDOW
+
+    df_features = create_features(df)
+    labelled = df_features.dropna(subset=feature_cols + ["target"])
+    new_rows = labelled[labelled["mvalidtime"] > first_new]
+    if len(new_rows) < MIN_NEW_ROWS:
+        return {"station": station_code, "mode": "unchanged", "new_rows": len(new_rows)}
+
+    # The newest new rows judge the update, the rows the update learns from end
+    # a horizon before them so none of their targets overlap
+    holdout = new_rows.iloc[len(new_rows) // 2 :]
+    train_end = holdout["mvalidtime"].min() - HORIZON
+    window = labelled[
+        (labelled["mvalidtime"] >= start) & (labelled["mvalidtime"] < train_end)
+    ]
+
+    if getattr(current, "incremental", False):
+        mode = "update"
+        # Other threads keep predicting with the registry's model, the update
+        # works on a copy that only goes live through registry.save
+        model = copy.deepcopy(current)
+        model.update(
+            window[feature_cols],
+            window["target"],
+            add_trees=ADD_TREES,
+            max_trees=MAX_TREES,
+        )
+        # The oldest trees still go back to where the model was first trained
+        trained_from = _in_time_zone(trained_from, tz)
+        metrics = dict(artifact["metrics"])
+        metrics["updates"] = metrics.get("updates", 0) + 1
+    else:
+        mode = "window"
+        trained_from = start
+        model, feature_cols, metrics = train_model(
+            window, return_metrics=True, backend=getattr(current, "name", None)
+        )
+
+    # Error of both models on rows neither has been trained on
+    X_holdout, y_holdout = holdout[feature_cols], holdout["target"]
+    mae_before = float(np.mean(np.abs(current.predict(X_holdout) - y_holdout)))
+    mae_after = float(np.mean(np.abs(model.predict(X_holdout) - y_holdout)))
+    result = {
+        "station": station_code,
+        "mode": mode,
+        "new_rows": len(new_rows),
+        "mae_before": mae_before,
+        "mae_after": mae_after,
+    }
+    if mae_after > mae_before:
+        # Keep serving the current model, the rows stay new for the next update
+        print(
+            f"Rejected {mode} of {model_path(station_code, name)}: MAE on "
+            f"{len(holdout)} held out rows {mae_before:.2f} -> {mae_after:.2f}"
+        )
+        return {**result, "mode": "rejected"}
+
+    metrics["new_rows"] = len(new_rows)
+    metrics["holdout_mae_before"] = mae_before
+    metrics["holdout_mae_after"] = mae_after
+
+    path = registry.save(
+        model,
+        feature_cols,
+        station_code,
+        name,
+        data_range=(trained_from, latest),
+        metrics=metrics,
+        keep_previous=True,
+    )
+    print(
+        f"Updated model {path} with {len(new_rows)} new rows ({mode}), MAE on "
+        f"{len(holdout)} held out rows {mae_before:.2f} -> {mae_after:.2f}"
+    )
+
+    return {**result, "artifact_path": path}
+
+
+def _load(station_code, file_path, start):
+    if station_code is None:
+        return load_data(file_path, start_date=_in_time_zone(start, "UTC"))
+
+    # The store keeps UTC times
+    return prepare_data(store.load(station_code, _in_time_zone(start, "UTC")))
+
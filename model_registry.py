@@ -0,0 +1,107 @@
+import os
+import shutil
+import threading
+
+from artifacts import build_artifact, load_artifact, save_artifact
+
+MODELS_DIR = "models"
+
+
+def model_path(station_code=None, name="rf"):
+    """Artifact path, rf.joblib in the working dir when no station is given"""
+    directory = (
+        "." if station_code is None else os.path.join(MODELS_DIR, str(station_code))
+    )
+    return os.path.join(directory, f"{name}.joblib")
+
+
+def previous_path(station_code=None, name="rf"):
+    """Where save(keep_previous=True) leaves the artifact it replaced"""
+    return model_path(station_code, f"{name}.prev")
+
+
+class ModelRegistry:
+    """Keeps every loaded model in memory and reloads it when its file changes
+
+    One registry is shared by all Streamlit sessions of the process, so a
+    model is loaded once and not on every prediction.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._models = {}
+
+    def get(self, station_code=None, name="rf"):
+        artifact = self.get_artifact(station_code, name)
+        return artifact["estimator"], artifact["feature_cols"]
+
+    def get_artifact(self, station_code=None, name="rf"):
+        key = (None if station_code is None else str(station_code), name)
+        path = model_path(station_code, name)
+
+        with self._key_lock(key):
+            signature = _signature(path)
+            cached = self._models.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+            artifact = load_artifact(path, station_code)
+            self._models[key] = (signature, artifact)
+            return artifact
+
+    def save(
+        self,
+        model,
+        feature_cols,
+        station_code=None,
+        name="rf",
+        data_range=None,
+        metrics=None,
+        keep_previous=False,
+    ):
+        key = (None if station_code is None else str(station_code), name)
+        path = model_path(station_code, name)
+        artifact = build_artifact(
+            model, feature_cols, station_code, data_range=data_range, metrics=metrics
+        )
+
+        with self._key_lock(key):
+            if keep_previous and os.path.exists(path):
+                # Copy rather than move, readers keep finding a model at path
+                shutil.copy2(path, previous_path(station_code, name))
+            save_artifact(artifact, path)
+            self._models[key] = (_signature(path), artifact)
+
+        return path
+
+    def rollback(self, station_code=None, name="rf"):
+        """Put back the artifact the last save(keep_previous=True) replaced"""
+        key = (None if station_code is None else str(station_code), name)
+        with self._key_lock(key):
+            os.replace(
+                previous_path(station_code, name), model_path(station_code, name)
+            )
+            self._models.pop(key, None)
+
+        return model_path(station_code, name)
+
+    def version(self, station_code=None, name="rf"):
+        """Changes whenever the artifact file is replaced, for keying derived caches"""
+        return _signature(model_path(station_code, name))
+
+    def loaded(self):
+        return list(self._models)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+
+def _signature(path):
+    # A new artifact always changes size or mtime, no need to hash tens of megabytes
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+registry = ModelRegistry()
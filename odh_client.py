@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Both can point at a local stub, e.g. for the benchmarks
+TOKEN_URL = os.environ.get(
+    "ODH_TOKEN_URL",
+    "https://auth.opendatahub.com/auth/realms/noi/protocol/openid-connect/token",
+)
+
+# TODO: Add these to env secrets
+CLIENT_ID = os.environ.get("ODH_CLIENT_ID", "opendatahub-bootcamp-2025")
+CLIENT_SECRET = os.environ.get("ODH_CLIENT_SECRET", "QiMsLjDpLi5ffjKRkI7eRgwOwNXoU9l1")
+
+API_URL = os.environ.get("ODH_API_URL", "https://mobility.api.opendatahub.com/v2")
+
+# Connection settings, override through the environment for slow links
+CONNECT_TIMEOUT = float(os.environ.get("ODH_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("ODH_READ_TIMEOUT", 120))
+MAX_RETRIES = int(os.environ.get("ODH_MAX_RETRIES", 3))
+BACKOFF_FACTOR = float(os.environ.get("ODH_BACKOFF_FACTOR", 0.5))
+POOL_SIZE = int(os.environ.get("ODH_POOL_SIZE", 10))
+
+# Keycloak tokens are valid for one hour, refresh a minute before they run out
+DEFAULT_TOKEN_LIFETIME = 3600
+TOKEN_REFRESH_MARGIN = 60
+
+
+class TokenManager:
+    """Caches the Keycloak access token and refreshes it shortly before it expires"""
+
+    def __init__(
+        self,
+        token_url=TOKEN_URL,
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        refresh_margin=TOKEN_REFRESH_MARGIN,
+    ):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+
+        # Shared by every Streamlit session in the process
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+
+    def get_token(self, force_refresh=False):
+        with self._lock:
+            if force_refresh or self._is_stale():
+                self._fetch_token()
+            return self._token
+
+    def invalidate(self, token=None):
+        # Only drop the token the caller saw rejected, so concurrent 401s
+        # do not throw away a token another thread has just refreshed
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _is_stale(self):
+        return (
+            self._token is None
+            or time.monotonic() >= self._expires_at - self.refresh_margin
+        )
+
+    def _fetch_token(self):
+        token_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        token_body = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+
+        token_response = session.post(
+            self.token_url,
+            headers=token_headers,
+            data=token_body,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        )
+        token_response.raise_for_status()
+        payload = token_response.json()
+
+        self._token = payload.get("access_token")
+        expires_in = payload.get("expires_in", DEFAULT_TOKEN_LIFETIME)
+        self._expires_at = time.monotonic() + expires_in
+
+
+def create_session(
+    max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE
+):
+    """Create a keep-alive session that retries transient failures with backoff"""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # The token request is a client credentials grant, safe to repeat
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    # Year long histories are multi megabyte JSON, always ask for compression
+    http.headers.update(
+        {"Accept-Encoding": "gzip, deflate", "Accept": "application/json"}
+    )
+    return http
+
+
+def get(url, timeout=None, http=None, **kwargs):
+    """Authenticated GET against the Open Data Hub, retried once on a 401
+
+    http is the session to send it on, the shared retrying session by default.
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if http is None:
+        http = session
+
+    bearer_token = token_manager.get_token()
+    response = http.get(
+        url, headers=_auth_headers(bearer_token), timeout=timeout, **kwargs
+    )
+
+    # The cached token may have been revoked server side, retry once with a fresh one
+    if response.status_code == 401:
+        token_manager.invalidate(bearer_token)
+        response = http.get(
+            url,
+            headers=_auth_headers(token_manager.get_token()),
+            timeout=timeout,
+            **kwargs,
+        )
+
+    response.raise_for_status()
+    return response
+
+
+def _auth_headers(bearer_token):
+    return {"Authorization": f"Bearer {bearer_token}"}
+
+
+session = create_session()
+token_manager = TokenManager()
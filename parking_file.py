@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+
+# Readings of the selected station and window, shared by the training, plot and
+# prediction code. Typed, sorted and columnar, so loads skip all text parsing
+DATA_PATH = "parking.parquet"
+
+# Parking counts fit in 16 bits, nullable because a reading can lack one of them
+COUNT_DTYPE = "Int16"
+# About a month of 5-minute readings per row group, time filters skip whole groups
+ROW_GROUP_SIZE = 8640
+
+
+def to_typed(df):
+    """Readings as the file stores them: UTC times, Int16 counts, sorted by time"""
+    typed = pd.DataFrame(
+        {
+            "mvalidtime": pd.to_datetime(df["mvalidtime"], utc=True),
+            "free": df["free"].astype(COUNT_DTYPE),
+            "occupied": df["occupied"].astype(COUNT_DTYPE),
+        }
+    )
+    if "scode" in df.columns:
+        typed.insert(0, "scode", df["scode"].astype(str))
+
+    return typed.sort_values("mvalidtime", kind="stable").reset_index(drop=True)
+
+
+def write_data(df, path=DATA_PATH):
+    df = to_typed(df).set_index("mvalidtime")
+
+    # Swap the file in, readers never see half of it
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+
+
+def ensure_data(path=DATA_PATH):
+    """Convert a CSV written by older versions (or the bundled sample) on first use"""
+    csv_path = f"{os.path.splitext(path)[0]}.csv"
+    if path.endswith(".parquet") and not os.path.exists(path):
+        if os.path.exists(csv_path):
+            print(f"Converting {csv_path} to {path}")
+            write_data(pd.read_csv(csv_path), path)
+    return path
+
+
+def read_data(path=DATA_PATH, start_date=None, end_date=None):
+    """Readings in [start_date, end_date), only the row groups in range are read"""
+    ensure_data(path)
+
+    filters = []
+    if start_date is not None:
+        filters.append(("mvalidtime", ">=", _utc(start_date)))
+    if end_date is not None:
+        filters.append(("mvalidtime", "<", _utc(end_date)))
+
+    df = pd.read_parquet(path, filters=filters or None)
+    return df.reset_index()
+
+
+def _utc(value):
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tz is None else value.tz_convert("UTC")
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.figure import Figure
+
+ANALYSIS_PATH = "parking_analysis.png"
+
+# One background renderer, plots never run on the prediction path
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plot-artifacts")
+_lock = threading.Lock()
+_requested = {}
+
+
+def request_analysis(df, fingerprint, path=ANALYSIS_PATH):
+    """Render the analysis PNG in the background unless it is current for this data
+
+    Returns the future of the render, or the one already running for the
+    same fingerprint.
+    """
+    with _lock:
+        requested = _requested.get(path)
+        if requested is not None and requested[0] == fingerprint:
+            return requested[1]
+
+        future = _executor.submit(render_analysis, df, path)
+        _requested[path] = (fingerprint, future)
+        return future
+
+
+def render_analysis(df, path=ANALYSIS_PATH):
+    # Figure instead of pyplot, pyplot's global state is not thread-safe
+    fig = Figure(figsize=(14, 8))
+
+    # Plot free spaces over time
+    ax = fig.add_subplot(2, 1, 1)
+    ax.plot(df["mvalidtime"], df["free"], label="Free Spaces")
+    ax.set_title("Parking Space Availability Over Time")
+    ax.set_xlabel("Date & Time")
+    ax.set_ylabel("Number of Free Spaces")
+    ax.legend()
+    ax.grid(True)
+
+    # Plot daily patterns
+    ax = fig.add_subplot(2, 1, 2)
+    df_grouped = df.groupby(df["mvalidtime"].dt.hour)["free"].mean()
+    ax.bar(df_grouped.index, df_grouped.values)
+    ax.set_title("Average Free Spaces by Hour of Day")
+    ax.set_xlabel("Hour of Day")
+    ax.set_ylabel("Average Free Spaces")
+    ax.set_xticks(range(0, 24))
+    ax.grid(True, axis="y")
+
+    fig.tight_layout()
+
+    # Render to a private file and swap it in, concurrent readers never see
+    # a half written PNG
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".png", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        fig.savefig(f, format="png")
+    os.replace(tmp_path, path)
+
+    return path
@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows, jobs are then only locked within one process
+    fcntl = None
+
+from bulk import train_station
+from downloader import download_many
+from incremental import update_model
+
+SYNC_INTERVAL = float(os.environ.get("ODH_SYNC_INTERVAL", 300))
+RETRAIN_INTERVAL = float(os.environ.get("ODH_RETRAIN_INTERVAL", 3600))
+# Days of history synced for and trained on by the scheduled jobs
+SYNC_DAYS = int(os.environ.get("ODH_SYNC_DAYS", 7))
+TRAIN_DAYS = int(os.environ.get("ODH_TRAIN_DAYS", 30))
+# Stations watched from startup, more are added with watch()
+STATIONS = [code for code in os.environ.get("ODH_SYNC_STATIONS", "").split(",") if code]
+# Stations selected in the app stay watched this long after they were last
+# viewed, and only the most recently viewed MAX_WATCHED of them
+WATCH_TTL = float(os.environ.get("ODH_WATCH_TTL", 24 * 3600))
+MAX_WATCHED = int(os.environ.get("ODH_MAX_WATCHED", 20))
+LOCK_DIR = os.path.join("data", "locks")
+
+
+class Job:
+    def __init__(self, name, func, interval, delay=0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.monotonic() + delay
+        self.lock = threading.Lock()
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+
+    def status(self):
+        return {
+            "name": self.name,
+            "running": self.lock.locked(),
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "next_run_in": max(self.next_run - time.monotonic(), 0),
+        }
+
+
+class Scheduler:
+    """Runs jobs on fixed intervals in background threads
+
+    A job never overlaps with itself: a run that is due while the previous
+    one is still going is skipped, and a lock file keeps other processes
+    (Streamlit, server.py) from running the same job at the same time.
+    """
+
+    def __init__(self, max_workers=2, lock_dir=LOCK_DIR):
+        self.lock_dir = lock_dir
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scheduler"
+        )
+
+    def add(self, name, func, interval, delay=0):
+        with self._lock:
+            self._jobs[name] = Job(name, func, interval, delay)
+        self._wakeup.set()
+
+    def start(self):
+        # Streamlit reruns the app script constantly, only the first call starts
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run_now(self, name):
+        """Run a job outside its schedule, False when it is already running"""
+        job = self._jobs[name]
+        if job.lock.locked():
+            return False
+        self._executor.submit(self._run, job)
+        return True
+
+    def status(self):
+        with self._lock:
+            return [job.status() for job in self._jobs.values()]
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            with self._lock:
+                jobs = list(self._jobs.values())
+
+            for job in jobs:
+                if job.next_run <= now:
+                    job.next_run = now + job.interval
+                    if not job.lock.locked():
+                        self._executor.submit(self._run, job)
+
+            next_run = min((job.next_run for job in jobs), default=now + 60)
+            self._wakeup.wait(max(next_run - time.monotonic(), 0))
+            self._wakeup.clear()
+
+    def _run(self, job):
+        if not job.lock.acquire(blocking=False):
+            return
+        try:
+            with self._file_lock(job.name) as acquired:
+                if not acquired:
+                    print(f"Job {job.name} is running in another process, skipping")
+                    return
+
+                start = time.monotonic()
+                job.last_run = time.time()
+                try:
+                    job.func()
+                    job.last_error = None
+                except Exception as e:
+                    job.last_error = str(e)
+                    traceback.print_exc()
+                job.last_duration = time.monotonic() - start
+        finally:
+            job.lock.release()
+
+    @contextmanager
+    def _file_lock(self, name):
+        if fcntl is None:
+            yield True
+            return
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(os.path.join(self.lock_dir, f"{name}.lock"), "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Last time each station was viewed, STATIONS are always watched
+_watched = {}
+_watched_lock = threading.Lock()
+
+
+def watch(station_code):
+    """Keep a station synced and its model retrained by the scheduled jobs,
+    until nobody has viewed it for WATCH_TTL
+    """
+    with _watched_lock:
+        _expire()
+        new = str(station_code) not in _watched and str(station_code) not in STATIONS
+        _watched[str(station_code)] = time.monotonic()
+        _expire()
+    # Fetch a newly watched station right away instead of on the next tick
+    if new:
+        scheduler.run_now("sync")
+
+
+def watched():
+    with _watched_lock:
+        _expire()
+        return sorted(set(STATIONS) | set(_watched))
+
+
+def _expire():
+    # Drop stations not viewed for WATCH_TTL, then all but the MAX_WATCHED
+    # most recently viewed
+    now = time.monotonic()
+    recent = sorted(_watched.items(), key=lambda item: item[1], reverse=True)
+    _watched.clear()
+    _watched.update(
+        (code, seen) for code, seen in recent[:MAX_WATCHED] if now - seen < WATCH_TTL
+    )
+
+
+def sync_stations():
+    station_codes = watched()
+    if not station_codes:
+        return
+
+    # Ranges already in the local store are skipped, so this only fetches the tail
+    start_date = date.today() - timedelta(days=SYNC_DAYS)
+    end_date = date.today() + timedelta(days=1)
+    failed = download_many(station_codes, str(start_date), str(end_date))
+    if failed:
+        print(f"{len(failed)} station chunks could not be synced")
+
+
+def retrain_stations():
+    failed = []
+    for station_code in watched():
+        # One station failing (e.g. too few readings to train on) must not
+        # keep the stations after it from being retrained
+        try:
+            retrain_station(station_code)
+        except Exception as e:
+            print(f"Skipping station {station_code}: {e}")
+            failed.append(station_code)
+
+    if failed:
+        raise RuntimeError(f"Retraining failed for stations {', '.join(failed)}")
+
+
+def retrain_station(station_code):
+    try:
+        return update_model(station_code)
+    except (FileNotFoundError, ValueError) as e:
+        # No model yet, or one that cannot be updated: train from scratch
+        print(f"Training station {station_code} from scratch: {e}")
+
+    start_date = date.today() - timedelta(days=TRAIN_DAYS)
+    end_date = date.today() + timedelta(days=1)
+    return train_station(station_code, str(start_date), str(end_date))
+
+
+scheduler = Scheduler()
+scheduler.add("sync", sync_stations, SYNC_INTERVAL)
+# The first retrain waits for the first sync to have landed
+scheduler.add("retrain", retrain_stations, RETRAIN_INTERVAL, delay=SYNC_INTERVAL)
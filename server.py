@@ -0,0 +1,130 @@
+from datetime import timedelta
+from typing import List, Optional
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from feature_cache import station_features
+from model_registry import registry
+from task2 import predict_batch
+
+# Run with: uvicorn server:app --workers 4
+app = FastAPI(title="Parking availability")
+
+MAX_FORECAST_POINTS = 2000
+
+
+class PredictionRequest(BaseModel):
+    station: Optional[str] = None
+    time: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[PredictionRequest]
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "models_loaded": len(registry.loaded())}
+
+
+@app.get("/predict")
+def predict(station: Optional[str] = None, time: Optional[str] = None):
+    return predict_many(
+        BatchRequest(requests=[PredictionRequest(station=station, time=time)])
+    )[0]
+
+
+@app.post("/predict")
+def predict_many(batch: BatchRequest):
+    """Answer a batch of (station, time) requests with one model.predict per station"""
+    by_station = {}
+    for i, request in enumerate(batch.requests):
+        by_station.setdefault(request.station, []).append((i, request.time))
+
+    results = [None] * len(batch.requests)
+    for station_code, requests in by_station.items():
+        df, model, feature_cols = _resources(station_code)
+        last_time = df["mvalidtime"].iloc[-1]
+        times = [
+            (
+                last_time + timedelta(hours=1)
+                if time is None
+                else _parse_time(time, last_time.tz)
+            )
+            for _, time in requests
+        ]
+
+        forecast = _predict(df, model, feature_cols, pd.DatetimeIndex(times).unique())
+        predicted = forecast.set_index("prediction_time")["predicted_free"]
+        for (i, _), time in zip(requests, times):
+            results[i] = {
+                "station": station_code,
+                "prediction_time": pd.Timestamp(time).isoformat(),
+                "predicted_free": int(predicted.loc[time]),
+            }
+
+    return results
+
+
+@app.get("/forecast")
+def forecast(
+    station: Optional[str] = None,
+    start: Optional[str] = None,
+    hours: float = 24,
+    freq: str = "15min",
+):
+    df, model, feature_cols = _resources(station)
+
+    last_time = df["mvalidtime"].iloc[-1]
+    start_time = last_time if start is None else _parse_time(start, last_time.tz)
+    try:
+        times = pd.date_range(
+            start_time, start_time + timedelta(hours=hours), freq=freq
+        )
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    if len(times) > MAX_FORECAST_POINTS:
+        raise HTTPException(422, f"At most {MAX_FORECAST_POINTS} points per forecast")
+
+    forecast = _predict(df, model, feature_cols, times)
+    return {
+        "station": station,
+        "forecast": [
+            {"prediction_time": time.isoformat(), "predicted_free": int(free)}
+            for time, free in zip(
+                forecast["prediction_time"], forecast["predicted_free"]
+            )
+        ],
+    }
+
+
+def _resources(station_code):
+    try:
+        df = station_features.get(station_code)
+        model, feature_cols = registry.get(station_code)
+    except FileNotFoundError:
+        raise HTTPException(404, f"No data or trained model for station {station_code}")
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    return df, model, feature_cols
+
+
+def _predict(df, model, feature_cols, times):
+    try:
+        return predict_batch(df, model, feature_cols, times)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+
+def _parse_time(value, tz):
+    try:
+        time = pd.Timestamp(value)
+    except ValueError:
+        raise HTTPException(422, f"Could not parse '{value}' as a date")
+
+    # Times without an offset are read in the data's time zone
+    if time.tz is None:
+        return time.tz_localize(tz)
+    return time.tz_convert(tz)
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+import odh_client
+from odh_client import API_URL, CONNECT_TIMEOUT
+
+CATALOGUE_PATH = os.path.join("data", "stations.json")
+# Stations and their capacity change rarely, a day old list is fine
+CATALOGUE_TTL = float(os.environ.get("ODH_STATIONS_TTL", 24 * 3600))
+# Give up quickly on a slow API when there is a cached list to fall back on
+CATALOGUE_READ_TIMEOUT = 10
+# After a failed refresh keep serving the cached list for a while before retrying
+FAILURE_BACKOFF = 60
+# No retries: a failed refresh falls back on the cached list and FAILURE_BACKOFF
+# instead of holding up the page through the shared session's retries
+catalogue_session = odh_client.create_session(max_retries=0, pool_size=1)
+
+STATIONS_URL = f"{API_URL}/flat%2Cnode/ParkingStation?limit=-1&offset=0&select=scode%2Csname%2Csorigin%2Csmetadata.capacity%2Csmetadata.municipality&shownull=false&distinct=true"
+
+
+class StationCatalogue:
+    """ParkingStation list cached in memory and on disk, indexed by scode"""
+
+    def __init__(self, path=CATALOGUE_PATH, ttl=CATALOGUE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # Held by the one thread fetching a new list, never while holding _lock
+        self._refresh_lock = threading.Lock()
+        self._stations = None
+        self._by_code = {}
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+
+    def stations(self):
+        self._ensure_fresh()
+        return self._stations or []
+
+    def get(self, station_code):
+        self._ensure_fresh()
+        return self._by_code.get(str(station_code))
+
+    def refresh(self):
+        with self._refresh_lock:
+            self._fetch()
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._stations is None:
+                self._load()
+            if not self._stale():
+                return
+            have_list = self._stations is not None
+
+        # One thread refreshes while the others keep serving the stale list,
+        # only without any list yet do they wait for it
+        if not self._refresh_lock.acquire(blocking=not have_list):
+            return
+        try:
+            # Another thread may have refreshed, or failed to, while this one waited
+            if self._stale():
+                self._fetch()
+        except (requests.RequestException, ValueError) as e:
+            # Serve the stale list rather than failing the page
+            print(f"Station list refresh failed, using cached copy: {e}")
+            self._retry_at = time.time() + FAILURE_BACKOFF
+        finally:
+            self._refresh_lock.release()
+
+    def _stale(self):
+        now = time.time()
+        return now - self._fetched_at >= self.ttl and now >= self._retry_at
+
+    def _fetch(self):
+        response = odh_client.get(
+            STATIONS_URL,
+            timeout=(CONNECT_TIMEOUT, CATALOGUE_READ_TIMEOUT),
+            http=catalogue_session,
+        )
+        stations = [_normalize(station) for station in response.json().get("data")]
+        fetched_at = time.time()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": fetched_at, "stations": stations}, f)
+        os.replace(tmp_path, self.path)
+
+        with self._lock:
+            self._set(stations, fetched_at)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self._set(cached["stations"], cached["fetched_at"])
+
+    def _set(self, stations, fetched_at):
+        self._stations = stations
+        self._by_code = {station["scode"]: station for station in stations}
+        self._fetched_at = fetched_at
+
+
+def _normalize(station):
+    # Depending on the select the API returns nested metadata either as
+    # "smetadata.capacity" keys or as a "smetadata" object
+    metadata = station.get("smetadata") or {}
+    for key in ("capacity", "municipality"):
+        value = station.get(f"smetadata.{key}", metadata.get(key))
+        if value is not None:
+            station[key] = value
+
+    station["scode"] = str(station["scode"])
+    return station
+
+
+catalogue = StationCatalogue()
@@ -0,0 +1,164 @@
+import itertools
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+STORE_PATH = os.environ.get("PARKING_STORE", os.path.join("data", "parking.sqlite"))
+
+# Readings arrive every 5 minutes and may land late, never mark the most
+# recent minutes as complete so the next fetch asks for them again
+LIVE_MARGIN = timedelta(minutes=15)
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    scode TEXT NOT NULL,
+    mvalidtime TEXT NOT NULL,
+    free INTEGER,
+    occupied INTEGER,
+    PRIMARY KEY (scode, mvalidtime)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS ranges (
+    scode TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    PRIMARY KEY (scode, start)
+) WITHOUT ROWID;
+"""
+
+
+class ParkingStore:
+    """Local per-station time series store that remembers which ranges it holds"""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def covered_ranges(self, station_code):
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT start, end FROM ranges WHERE scode = ? ORDER BY start",
+                (str(station_code),),
+            ).fetchall()
+        return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in rows]
+
+    def missing_ranges(self, station_code, start_date, end_date):
+        """Return the [start, end) windows of the request the store does not hold yet"""
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        missing = []
+        cursor = start
+        for covered_start, covered_end in self.covered_ranges(station_code):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            missing.append((cursor, end))
+
+        return missing
+
+    def add_measurements(self, station_code, df):
+        counts = df[["free", "occupied"]].astype("Int64").astype(object)
+        counts = counts.where(counts.notna(), None)
+        rows = zip(
+            itertools.repeat(str(station_code)),
+            df["mvalidtime"].tolist(),
+            counts["free"].tolist(),
+            counts["occupied"].tolist(),
+        )
+
+        with self._write_lock, closing(self._connect()) as connection:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO measurements VALUES (?, ?, ?, ?)", rows
+                )
+
+    def mark_covered(self, station_code, start_date, end_date):
+        """Record [start, end) as fetched, clipped so live data is fetched again"""
+        start = pd.Timestamp(start_date)
+        end = min(pd.Timestamp(end_date), _utcnow() - LIVE_MARGIN)
+        if end <= start:
+            return
+
+        with self._write_lock:
+            # Merge with every overlapping or touching range
+            ranges = self.covered_ranges(station_code)
+            for covered_start, covered_end in ranges:
+                if covered_start <= end and covered_end >= start:
+                    start = min(start, covered_start)
+                    end = max(end, covered_end)
+
+            with closing(self._connect()) as connection:
+                with connection:
+                    connection.execute(
+                        "DELETE FROM ranges WHERE scode = ? AND start <= ? AND end >= ?",
+                        (
+                            str(station_code),
+                            end.strftime(TIME_FORMAT),
+                            start.strftime(TIME_FORMAT),
+                        ),
+                    )
+                    connection.execute(
+                        "INSERT INTO ranges VALUES (?, ?, ?)",
+                        (
+                            str(station_code),
+                            start.strftime(TIME_FORMAT),
+                            end.strftime(TIME_FORMAT),
+                        ),
+                    )
+
+    def latest(self, station_code):
+        with closing(self._connect()) as connection:
+            (latest,) = connection.execute(
+                "SELECT MAX(mvalidtime) FROM measurements WHERE scode = ?",
+                (str(station_code),),
+            ).fetchone()
+        return latest
+
+    def load(self, station_code, start_date=None, end_date=None):
+        query = "SELECT mvalidtime, free, occupied FROM measurements WHERE scode = ?"
+        params = [str(station_code)]
+        # mvalidtime is stored as the API returns it ("2025-03-01 00:00:00.000+0000")
+        # which sorts and compares correctly against plain ISO dates
+        if start_date is not None:
+            query += " AND mvalidtime >= ?"
+            params.append(_to_api_time(start_date))
+        if end_date is not None:
+            query += " AND mvalidtime < ?"
+            params.append(_to_api_time(end_date))
+        query += " ORDER BY mvalidtime"
+
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(query, connection, params=params)
+
+
+def _to_api_time(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+store = ParkingStore()
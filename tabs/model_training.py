@@ -1,18 +1,73 @@
 import streamlit as st
-from task2 import load_data, create_features, train_model
-import pickle as pkl
 
-from get_data import get_data
+from feature_cache import feature_cache
+from model_registry import registry
+from parking_file import DATA_PATH
+from scheduler import scheduler
+from training_jobs import DONE, FAILED, training_jobs
+
 
 def model_training_page(station,start_date,end_date):
-    get_data(station_code=station["scode"], start_date=start_date, end_date=end_date)
-    df = load_data("parking.csv")
-    df_features = create_features(df)
+    # Trains on what "Fetch Data" wrote, nothing is downloaded during the render
+    try:
+        df = df_features = feature_cache.get_features(DATA_PATH)
+    except FileNotFoundError:
+        st.info("Fetch some data first")
+        return
 
     if st.button("Train model", use_container_width=True, type="primary"):
-        try:
-            model, feature_cols = train_model(df_features)
-            pkl.dump(model, open("rf.pkl", "wb"))
-            pkl.dump(feature_cols, open("rf_feature_cols.pkl", "wb"))
-        except ValueError:
-            st.warning("Make sure to have some data to train the model")
\ No newline at end of file
+        if df_features.empty:
+            st.warning("Make sure to have some data to train the model")
+        else:
+            # The same data is never trained twice at once, the running job is reused
+            job = training_jobs.submit(
+                df_features,
+                feature_cache.fingerprint(DATA_PATH),
+                data_range=(df["mvalidtime"].min(), df["mvalidtime"].max()),
+            )
+            st.session_state["training_job"] = job.id
+
+    job_id = st.session_state.get("training_job")
+    if job_id is not None:
+        training_status(job_id)
+
+    # Latest model the scheduled retrain finished for this station
+    try:
+        artifact = registry.get_artifact(station["scode"])
+        st.caption(
+            f"Background model for {station['sname']}: trained {artifact['created_at']} "
+            f"on {artifact['data_range'][0]} to {artifact['data_range'][1]}"
+        )
+    except (FileNotFoundError, ValueError):
+        st.caption(f"No background model for {station['sname']} yet")
+    st.dataframe(scheduler.status())
+
+
+def training_status(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return
+
+    if not job.done():
+        training_progress(job_id)
+    elif job.status == DONE:
+        st.success(
+            f"Model trained, validation MAE {job.metrics['val_mae']:.2f} parking spaces"
+        )
+    elif job.status == FAILED:
+        st.warning(f"Training failed: {job.error}")
+    else:
+        st.info("Training cancelled")
+
+
+# Only this part reruns while the job is going, the rest of the page stays put
+@st.fragment(run_every="1s")
+def training_progress(job_id):
+    job = training_jobs.get(job_id)
+    if job.done():
+        # One full rerun shows the result outside the fragment, polling stops
+        st.rerun()
+
+    st.progress(job.progress, text=f"Training job {job.id}: {job.status}")
+    if st.button("Cancel training", key=f"cancel_{job.id}"):
+        job.cancel()
@@ -1,7 +1,7 @@
 import streamlit as st
 import datetime
 
-from predict import predict
+from predict import forecast, predict
 
 
 def get_current_time():
@@ -19,7 +19,7 @@ def get_current_time():
 
     return rounded_time
 
-def occupancy_prediction_page():
+def occupancy_prediction_page(station):
     start_date = st.date_input('Enter date of arrival', value=datetime.date.today())
     start_time = st.time_input('Enter time of arrival', get_current_time())
 
@@ -27,8 +27,20 @@ def occupancy_prediction_page():
 
     if st.button("Estimate", use_container_width=True, type="primary", key="occupancy_prediction"):
         with st.spinner("Wait for it...", show_time=True):
-            free_spaces = predict(prediction_datetime, True)
+            free_spaces = predict(
+                prediction_datetime, True, station_code=station["scode"]
+            )
 
         if free_spaces is not None:
             st.subheader(f"Expected number of free parking spaces {free_spaces}", divider=True)
 
+            # Availability over the following day, one batch prediction
+            curve = forecast(
+                prediction_datetime,
+                hours=24,
+                freq="15min",
+                station_code=station["scode"],
+            )
+            if curve is not None:
+                st.line_chart(curve, x="prediction_time", y="predicted_free")
+
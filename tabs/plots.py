@@ -2,13 +2,28 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 import pandas as pd
-import numpy as np
-import pickle as pkl
 
-from task2 import load_data, create_features
+from downsample import MAX_POINTS, min_max_downsample, sample
+from evaluation import evaluations
+from feature_cache import feature_cache
+from parking_file import DATA_PATH
 
+MAX_SCATTER_POINTS = 5000
 
-def render_data_plot(df):
+
+# Cached per data fingerprint, the frame itself is not hashed (leading underscore)
+@st.cache_data(max_entries=8, show_spinner=False)
+def hourly_profile(fingerprint, _df):
+    return _df.groupby("hour")["free"].mean()
+
+
+# WebGL line of at most MAX_POINTS points
+def line_trace(x, y, **kwargs):
+    x, y = min_max_downsample(x, y, MAX_POINTS)
+    return go.Scattergl(x=x, y=y, mode="lines", **kwargs)
+
+
+def render_data_plot(df, fingerprint):
     # Create subplots with 2 rows and 1 column
     fig = make_subplots(
         rows=2,
@@ -21,13 +36,13 @@ def render_data_plot(df):
 
     # Plot free spaces over time
     fig.add_trace(
-        go.Scatter(x=df["mvalidtime"], y=df["free"], mode="lines", name="Free Spaces"),
+        line_trace(df["mvalidtime"], df["free"], name="Free Spaces"),
         row=1,
         col=1,
     )
 
     # Plot daily patterns
-    df_grouped = df.groupby("hour")["free"].mean()
+    df_grouped = hourly_profile(fingerprint, df)
     fig.add_trace(go.Bar(x=df_grouped.index, y=df_grouped.values), row=2, col=1)
 
     # Update layout
@@ -63,22 +78,7 @@ def render_data_plot(df):
     st.plotly_chart(fig)
 
 
-def render_performance_plot(df, model, feature_cols):
-    # Get data with complete features and target
-    clean_df = df.dropna(subset=["target"] + feature_cols)
-
-    # Get features and make predictions for all available data
-    X = clean_df[feature_cols]
-    y_actual = clean_df["target"]
-    y_pred = model.predict(X)
-
-    # Get datetime for plotting
-    datetimes = clean_df["mvalidtime"]
-
-    # Create a DataFrame for easy plotting
-    results_df = pd.DataFrame(
-        {"mvalidtime": datetimes, "actual": y_actual, "predicted": y_pred}
-    )
+def render_performance_plot(results_df, metrics):
 
     # Create time series comparison plots with two subplots
     fig1 = make_subplots(
@@ -92,10 +92,9 @@ def render_performance_plot(df, model, feature_cols):
 
     # Plot full time series
     fig1.add_trace(
-        go.Scatter(
-            x=results_df["mvalidtime"],
-            y=results_df["actual"],
-            mode="lines",
+        line_trace(
+            results_df["mvalidtime"],
+            results_df["actual"],
             name="Actual Free Spaces",
             line=dict(color="blue"),
         ),
@@ -104,10 +103,9 @@ def render_performance_plot(df, model, feature_cols):
     )
 
     fig1.add_trace(
-        go.Scatter(
-            x=results_df["mvalidtime"],
-            y=results_df["predicted"],
-            mode="lines",
+        line_trace(
+            results_df["mvalidtime"],
+            results_df["predicted"],
             name="Predicted Free Spaces",
             line=dict(color="red"),
         ),
@@ -122,10 +120,9 @@ def render_performance_plot(df, model, feature_cols):
     zoom_df = results_df[last_two_days]
 
     fig1.add_trace(
-        go.Scatter(
-            x=zoom_df["mvalidtime"],
-            y=zoom_df["actual"],
-            mode="lines",
+        line_trace(
+            zoom_df["mvalidtime"],
+            zoom_df["actual"],
             name="Actual Free Spaces (Last 2 Days)",
             line=dict(color="blue"),
             showlegend=False,
@@ -135,10 +132,9 @@ def render_performance_plot(df, model, feature_cols):
     )
 
     fig1.add_trace(
-        go.Scatter(
-            x=zoom_df["mvalidtime"],
-            y=zoom_df["predicted"],
-            mode="lines",
+        line_trace(
+            zoom_df["mvalidtime"],
+            zoom_df["predicted"],
             name="Predicted Free Spaces (Last 2 Days)",
             line=dict(color="red"),
             showlegend=False,
@@ -177,11 +173,12 @@ def render_performance_plot(df, model, feature_cols):
     # Create scatter plot to see correlation
     fig2 = go.Figure()
 
-    # Add scatter plot
+    # Add scatter plot, a random sample shows the same cloud
+    points_df = sample(results_df, MAX_SCATTER_POINTS)
     fig2.add_trace(
-        go.Scatter(
-            x=results_df["actual"],
-            y=results_df["predicted"],
+        go.Scattergl(
+            x=points_df["actual"],
+            y=points_df["predicted"],
             mode="markers",
             marker=dict(size=8, color="blue", opacity=0.5),
             name="Data Points",
@@ -215,22 +212,17 @@ def render_performance_plot(df, model, feature_cols):
 
     st.plotly_chart(fig2)
 
-    # Calculate some statistics
-    error = results_df["predicted"] - results_df["actual"]
-    mae = np.mean(np.abs(error))
-    rmse = np.sqrt(np.mean(error**2))
-
-    st.metric(label="Mean Absolute Error", value=f"{mae:.2f} spaces")
-    st.metric(label="Root Mean Square Error", value=f"{rmse:.2f} spaces")
+    st.metric(label="Mean Absolute Error", value=f"{metrics['mae']:.2f} spaces")
+    st.metric(label="Root Mean Square Error", value=f"{metrics['rmse']:.2f} spaces")
 
 
 def plots_page():
-    df = load_data(file_path="parking.csv")
-    df = create_features(df=df)
+    df = feature_cache.get_features(DATA_PATH)
+    fingerprint = feature_cache.fingerprint(DATA_PATH)
 
-    render_data_plot(df=df)
+    render_data_plot(df=df, fingerprint=fingerprint)
 
-    model = pkl.load(open("rf.pkl", "rb"))
-    feature_cols = pkl.load(open("rf_feature_cols.pkl", "rb"))
+    # The model only runs over the history when the data or the model changed
+    results_df, metrics = evaluations.evaluate(df, fingerprint)
 
-    render_performance_plot(df=df, model=model, feature_cols=feature_cols)
+    render_performance_plot(results_df=results_df, metrics=metrics)
@@ -1,16 +1,38 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ShuffleSplit
 import matplotlib.pyplot as plt
 from datetime import timedelta
-import pickle as pkl
 
+from backends import get_backend
+from evaluation import backtest, summarize
+from features import complete_rows, create_features, feature_matrix
+from forecast import (
+    MAX_RECURSIVE_HORIZON,
+    recursive_forecast,
+    sample_trajectory,
+    seasonal_forecast,
+)
+from model_registry import registry
+from parking_file import DATA_PATH, read_data
+
+
+# Load the data, [start_date, end_date) when given
+def load_data(file_path=DATA_PATH, start_date=None, end_date=None):
+    if not file_path.endswith(".csv"):
+        # Typed and sorted already, the time filter is pushed into the reader
+        return read_data(file_path, start_date, end_date)
+
+    df = prepare_data(pd.read_csv(file_path))
+    if start_date is not None:
+        df = df[df["mvalidtime"] >= start_date]
+    if end_date is not None:
+        df = df[df["mvalidtime"] < end_date]
+    return df
 
-# Load the data
-def load_data(file_path):
-    df = pd.read_csv(file_path)
 
+# Bring raw free/occupied readings (CSV or local store) into model shape
+def prepare_data(df):
     # Ensure the first column is parsed as datetime
     df.columns = ["mvalidtime", "free", "occupied"]
     df["mvalidtime"] = pd.to_datetime(df["mvalidtime"])
@@ -21,43 +43,8 @@ def load_data(file_path):
     return df
 
 
-# Feature engineering
-def create_features(df):
-    # Extract datetime features
-    df["hour"] = df["mvalidtime"].dt.hour
-    df["day_of_week"] = df["mvalidtime"].dt.dayofweek
-    df["day_of_month"] = df["mvalidtime"].dt.day
-    df["month"] = df["mvalidtime"].dt.month
-    df["year"] = df["mvalidtime"].dt.year
-
-    # Calculate time differences since the data might have gaps
-    df["time_diff"] = df["mvalidtime"].diff().dt.total_seconds()
-
-    # Calculate rolling statistics (last hour's trend)
-    # First, create a temporary DataFrame with just datetime and free
-    temp_df = df[["mvalidtime", "free"]].copy()
-
-    # Create lagged features (values from previous time steps)
-    for i in range(1, 13):  # Create 12 lags (assuming 5-minute intervals)
-        temp_df[f"free_lag_{i}"] = temp_df["free"].shift(i)
-
-    # Add these features back to the original DataFrame
-    lag_columns = [col for col in temp_df.columns if "lag" in col]
-    df = pd.concat([df, temp_df[lag_columns]], axis=1)
-
-    # Calculate rate of change
-    df["rate_of_change"] = (df["free"] - df["free_lag_1"]) / df["time_diff"]
-
-    # Create target variable: free spaces in one hour
-    # 3600 seconds = 1 hour, our interval is 300 seconds, so shift by 12 rows
-    df["target"] = df["free"].shift(-12)
-
-    return df
-
-
-# Train the model
-def train_model(df):
-    # Features we'll use for prediction
+# Features we'll use for prediction
+def get_feature_cols(df):
     feature_cols = [
         "hour",
         "day_of_week",
@@ -73,21 +60,32 @@ def train_model(df):
     lag_cols = [col for col in df.columns if "lag" in col]
     feature_cols.extend(lag_cols)
 
-    # Remove rows with NaN (will be at the beginning due to lag features)
-    clean_df = df.dropna()
+    return feature_cols
+
+
+# Train the model
+def train_model(df, return_metrics=False, backend=None, progress=None):
+    feature_cols = get_feature_cols(df)
 
-    # Split features and target
-    X = clean_df[feature_cols]
-    y = clean_df["target"]
+    # Skip rows with NaN (will be at the beginning due to lag features)
+    rows = complete_rows(df, feature_cols)
 
-    # Split into training and validation sets
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=42
+    # Split into training and validation sets, the same split train_test_split makes
+    train, val = next(
+        ShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(rows)
     )
 
+    # Training rows first and validation rows after in one float32 matrix, so
+    # both sets are views. The DataFrame wraps the array without copying and
+    # keeps the feature names the model is later called with
+    X, y = feature_matrix(df, feature_cols, rows[np.concatenate([train, val])])
+    X = pd.DataFrame(X, columns=feature_cols, copy=False)
+    X_train, X_val = X.iloc[: len(train)], X.iloc[len(train) :]
+    y_train, y_val = y[: len(train)], y[len(train) :]
+
     # Create and train the model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    model = get_backend(backend)
+    model.fit(X_train, y_train, progress=progress)
 
     # Evaluate the model
     train_score = model.score(X_train, y_train)
@@ -101,13 +99,24 @@ def train_model(df):
     mae = np.mean(np.abs(y_pred - y_val))
     print(f"Mean Absolute Error: {mae:.2f} parking spaces")
 
-    # Feature importance
-    feature_importance = pd.DataFrame(
-        {"Feature": feature_cols, "Importance": model.feature_importances_}
-    ).sort_values("Importance", ascending=False)
-
-    print("\nTop 10 most important features:")
-    print(feature_importance.head(10))
+    # Feature importance, not every backend has one
+    if model.feature_importances_ is not None:
+        feature_importance = pd.DataFrame(
+            {"Feature": feature_cols, "Importance": model.feature_importances_}
+        ).sort_values("Importance", ascending=False)
+
+        print("\nTop 10 most important features:")
+        print(feature_importance.head(10))
+
+    if return_metrics:
+        metrics = {
+            "train_r2": float(train_score),
+            "val_r2": float(val_score),
+            "val_mae": float(mae),
+            "rows": len(rows),
+            "backend": model.name,
+        }
+        return model, feature_cols, metrics
 
     return model, feature_cols
 
@@ -119,49 +128,80 @@ def predict_future(df, model, feature_cols, prediction_time=None):
         last_time = df["mvalidtime"].iloc[-1]
         prediction_time = last_time + timedelta(hours=1)
 
-    # Get the most recent complete row of data
-    latest_data = df.iloc[-1:].copy()
-
-    # Create a new row for the prediction time
-    prediction_row = latest_data.copy()
-    prediction_row["mvalidtime"] = prediction_time
-
-    # Update datetime features
-    prediction_row["hour"] = prediction_time.hour
-    prediction_row["day_of_week"] = prediction_time.dayofweek
-    prediction_row["day_of_month"] = prediction_time.day
-    prediction_row["month"] = prediction_time.month
-    prediction_row["year"] = prediction_time.year
-
-    # Make sure we have all required features
-    missing_cols = set(feature_cols) - set(prediction_row.columns)
-    for col in missing_cols:
-        prediction_row[col] = 0
-
-    # Make prediction
-    X_pred = prediction_row[feature_cols]
-    predicted_spaces = model.predict(X_pred)[0]
-
-    return prediction_time, round(predicted_spaces)
+    forecast = predict_batch(df, model, feature_cols, [prediction_time])
+
+    return prediction_time, int(forecast["predicted_free"].iloc[0])
+
+
+# Predict availability for many times (and stations)
+def predict_batch(
+    df,
+    model,
+    feature_cols,
+    prediction_times,
+    max_recursive_horizon=MAX_RECURSIVE_HORIZON,
+):
+    prediction_times = pd.DatetimeIndex(prediction_times)
+
+    # Times shortly after the data are rolled forward from the last observations,
+    # later ones continue from there into the stations' usual free spaces at
+    # that weekday and hour, earlier ones only get the latter
+    last_time = df["mvalidtime"].max()
+    query_times = _in_time_zone(prediction_times, last_time.tz)
+    past = query_times <= last_time
+    beyond = query_times > last_time + max_recursive_horizon
+    recursive = ~past & ~beyond
+
+    forecasts = []
+    if past.any():
+        forecasts.append(
+            seasonal_forecast(df, prediction_times[past], query_times[past])
+        )
+    if recursive.any() or beyond.any():
+        until = (
+            last_time + max_recursive_horizon
+            if beyond.any()
+            else query_times[recursive].max()
+        )
+        trajectory = recursive_forecast(df, model, feature_cols, until=until)
+    if recursive.any():
+        forecasts.append(
+            sample_trajectory(
+                trajectory, prediction_times[recursive], query_times[recursive]
+            )
+        )
+    if beyond.any():
+        forecasts.append(
+            seasonal_forecast(
+                df, prediction_times[beyond], query_times[beyond], anchor=trajectory
+            )
+        )
+
+    forecast = pd.concat(forecasts, ignore_index=True)
+    forecast["predicted_free"] = np.round(forecast["predicted_free"]).astype(int)
+
+    order = ["prediction_time"]
+    if "scode" in df.columns:
+        order.insert(0, "scode")
+    return forecast.sort_values(order, kind="stable").reset_index(drop=True)
+
+
+def _in_time_zone(times, tz):
+    # Naive times from the UI are taken to be in the data's time zone
+    if times.tz is None and tz is not None:
+        return times.tz_localize(tz)
+    if times.tz is not None and tz is None:
+        return times.tz_localize(None)
+    if times.tz is not None:
+        return times.tz_convert(tz)
+    return times
 
 
 # Compare predicted vs actual values
-def plot_predicted_vs_actual(df, model, feature_cols):
-    # Get data with complete features and target
-    clean_df = df.dropna(subset=["target"] + feature_cols)
-
-    # Get features and make predictions for all available data
-    X = clean_df[feature_cols]
-    y_actual = clean_df["target"]
-    y_pred = model.predict(X)
-
-    # Get datetime for plotting
-    datetimes = clean_df["mvalidtime"]
-
-    # Create a DataFrame for easy plotting
-    results_df = pd.DataFrame(
-        {"mvalidtime": datetimes, "actual": y_actual, "predicted": y_pred}
-    )
+def plot_predicted_vs_actual(df, model, feature_cols, results_df=None):
+    # Stored evaluation results can be passed in, otherwise predict all the data
+    if results_df is None:
+        results_df = backtest(df, model, feature_cols)
 
     # Plot the comparison
     plt.figure(figsize=(14, 8))
@@ -218,12 +258,9 @@ def plot_predicted_vs_actual(df, model, feature_cols):
     plt.savefig("correlation_plot.png")
 
     # Calculate some statistics
-    error = results_df["predicted"] - results_df["actual"]
-    mae = np.mean(np.abs(error))
-    rmse = np.sqrt(np.mean(error**2))
-
-    print(f"Mean Absolute Error: {mae:.2f} spaces")
-    print(f"Root Mean Square Error: {rmse:.2f} spaces")
+    metrics = summarize(results_df)
+    print(f"Mean Absolute Error: {metrics['mae']:.2f} spaces")
+    print(f"Root Mean Square Error: {metrics['rmse']:.2f} spaces")
 
     return results_df
 
@@ -243,7 +280,7 @@ def visualize_parking_data(df):
 
     # Plot daily patterns
     plt.subplot(2, 1, 2)
-    df_grouped = df.groupby("hour")["free"].mean()
+    df_grouped = df.groupby(df["mvalidtime"].dt.hour)["free"].mean()
     plt.bar(df_grouped.index, df_grouped.values)
     plt.title("Average Free Spaces by Hour of Day")
     plt.xlabel("Hour of Day")
@@ -258,7 +295,7 @@ def visualize_parking_data(df):
 
 def main(use_stored_model=True):
     # Load data
-    file_path = "parking.csv"  # Update with your file path
+    file_path = DATA_PATH  # Update with your file path
     try:
         df = load_data(file_path)
         print(f"Loaded {len(df)} records from {file_path}")
@@ -271,18 +308,35 @@ def main(use_stored_model=True):
     df_features = create_features(df)
     print(f"Created features. Shape: {df_features.shape}")
 
+    model = None
     if use_stored_model:
-        model = pkl.load(open("rf.pkl", "rb"))
-        feature_cols = pkl.load(open("rf_feature_cols.pkl", "rb"))
-    else:
+        try:
+            model, feature_cols = registry.get()
+        except (FileNotFoundError, ValueError) as e:
+            # Missing, or rejected by check_artifact (older features, other
+            # library versions): train a new one as if there was none
+            print(f"Saved model not usable: {e}. Training a new model...")
+
+    if model is None:
         # Train model
-        model, feature_cols = train_model(df_features)
-        pkl.dump(model, open("rf.pkl", "wb"))
-        pkl.dump(feature_cols, open("rf_feature_cols.pkl", "wb"))
+        model, feature_cols, metrics = train_model(df_features, return_metrics=True)
+        registry.save(
+            model,
+            feature_cols,
+            data_range=(df["mvalidtime"].min(), df["mvalidtime"].max()),
+            metrics=metrics,
+        )
+
+    # Plot predicted vs actual, evaluated once per model and data file
+    # (imported here, feature_cache itself imports this module)
+    from evaluation import evaluations
+    from feature_cache import feature_cache
 
-    # Plot predicted vs actual
     print("\nGenerating predicted vs actual comparison plots...")
-    plot_predicted_vs_actual(df_features, model, feature_cols)
+    results_df, _ = evaluations.evaluate(
+        df_features, feature_cache.fingerprint(file_path)
+    )
+    plot_predicted_vs_actual(df_features, model, feature_cols, results_df)
     print("Created visualization: predicted_vs_actual.png and correlation_plot.png")
 
     # Make prediction for one hour in the future
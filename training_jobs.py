@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from model_registry import registry
+from task2 import train_model
+
+MAX_WORKERS = int(os.environ.get("ODH_TRAINING_WORKERS", 2))
+# Finished jobs kept for status polling, oldest forgotten first
+MAX_FINISHED = 50
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = (
+    "queued",
+    "running",
+    "done",
+    "failed",
+    "cancelled",
+)
+
+
+class Cancelled(Exception):
+    pass
+
+
+class TrainingJob:
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex[:8]
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.metrics = None
+        self.artifact_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+        # Still queued: drop it before it starts, running jobs stop at their
+        # next progress report
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def _report(self, fraction):
+        if self._cancel.is_set():
+            raise Cancelled()
+        self.progress = fraction
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+
+class TrainingJobs:
+    """Trains models in a background pool, Streamlit reruns only poll the jobs
+
+    Submitting the same (station, data fingerprint, backend) while a job for
+    it is queued, running or done returns that job instead of training the
+    same model twice.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="training"
+        )
+
+    def submit(
+        self, df_features, fingerprint, station_code=None, data_range=None, backend=None
+    ):
+        key = (station_code, fingerprint, backend)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.status in (QUEUED, RUNNING, DONE):
+                    return job
+
+            job = TrainingJob(key)
+            self._jobs[job.id] = job
+            self._forget_finished()
+            job.future = self._executor.submit(
+                self._run, job, df_features, station_code, data_range, backend
+            )
+            return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job, df_features, station_code, data_range, backend):
+        if job._cancel.is_set():
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+
+        try:
+            model, feature_cols, metrics = train_model(
+                df_features, return_metrics=True, backend=backend, progress=job._report
+            )
+            job.artifact_path = registry.save(
+                model,
+                feature_cols,
+                station_code,
+                data_range=data_range,
+                metrics=metrics,
+            )
+            job.metrics = metrics
+            job._finish(DONE)
+        except Cancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job._finish(FAILED, str(e))
+
+    def _forget_finished(self):
+        finished = sorted(
+            (job for job in self._jobs.values() if job.done()),
+            key=lambda job: job.finished_at,
+        )
+        for job in finished[: max(len(finished) - MAX_FINISHED, 0)]:
+            del self._jobs[job.id]
+
+
+training_jobs = TrainingJobs()
@@ -0,0 +1,129 @@
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import TimeSeriesSplit
+
+from features import FREQ, HORIZON
+from task2 import get_feature_cols, load_data, create_features
+
+N_SPLITS = 5
+
+PARAM_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 5],
+}
+
+# Column subsets to compare, picked from get_feature_cols
+FEATURE_SETS = {
+    "all": lambda cols: cols,
+    # Day of month / month / year mostly let the forest memorise dates
+    "no_date": lambda cols: [
+        col for col in cols if col not in ("day_of_month", "month", "year")
+    ],
+    "short_lags": lambda cols: [
+        col
+        for col in cols
+        if "lag" not in col or col in ("free_lag_1", "free_lag_2", "free_lag_3")
+    ],
+}
+
+# Arrays opened by a worker process, memory-mapped once and reused for every task
+_arrays = {}
+
+
+def search(
+    df,
+    param_grid=PARAM_GRID,
+    feature_sets=FEATURE_SETS,
+    n_splits=N_SPLITS,
+    max_workers=None,
+):
+    """Walk-forward cross-validation of every candidate, spread over a process pool
+
+    Every fold trains on the past and validates on a later block. The two are
+    one HORIZON of rows apart, so no training target falls in the validation
+    window. Returns the leaderboard sorted by mean validation MAE.
+    """
+    feature_cols = get_feature_cols(df)
+    clean_df = df.dropna(subset=feature_cols + ["target"]).sort_values("mvalidtime")
+
+    candidates = [
+        {"feature_set": name, **dict(zip(param_grid, values))}
+        for name in feature_sets
+        for values in itertools.product(*param_grid.values())
+    ]
+    columns = {
+        name: [feature_cols.index(col) for col in select(feature_cols)]
+        for name, select in feature_sets.items()
+    }
+    gap = HORIZON // pd.Timedelta(FREQ)
+    folds = list(TimeSeriesSplit(n_splits=n_splits, gap=gap).split(clean_df))
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Workers memory-map one read-only copy instead of each receiving a pickle
+        X_path = os.path.join(directory, "X.npy")
+        y_path = os.path.join(directory, "y.npy")
+        np.save(X_path, clean_df[feature_cols].to_numpy(dtype=np.float32))
+        np.save(y_path, clean_df["target"].to_numpy(dtype=np.float32))
+
+        tasks = [
+            (candidate, columns[candidate["feature_set"]], train, val, X_path, y_path)
+            for candidate in candidates
+            for train, val in folds
+        ]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_evaluate, tasks, chunksize=1))
+
+    leaderboard = (
+        pd.DataFrame(results)
+        .groupby(["feature_set", *param_grid], dropna=False)
+        .agg(
+            mae=("mae", "mean"),
+            mae_std=("mae", "std"),
+            rmse=("rmse", "mean"),
+            fit_seconds=("fit_seconds", "mean"),
+        )
+        .sort_values("mae")
+        .reset_index()
+    )
+    return leaderboard
+
+
+def _evaluate(task):
+    candidate, columns, train, val, X_path, y_path = task
+    X, y = _load(X_path), _load(y_path)
+
+    params = {key: value for key, value in candidate.items() if key != "feature_set"}
+    model = RandomForestRegressor(random_state=42, n_jobs=1, **params)
+
+    start = time.perf_counter()
+    model.fit(X[np.ix_(train, columns)], y[train])
+    fit_seconds = time.perf_counter() - start
+
+    error = model.predict(X[np.ix_(val, columns)]) - y[val]
+    return {
+        **candidate,
+        "mae": float(np.mean(np.abs(error))),
+        "rmse": float(np.sqrt(np.mean(error**2))),
+        "fit_seconds": fit_seconds,
+    }
+
+
+def _load(path):
+    array = _arrays.get(path)
+    if array is None:
+        array = _arrays[path] = np.load(path, mmap_mode="r")
+    return array
+
+
+if __name__ == "__main__":
+    df = create_features(load_data())
+    leaderboard = search(df)
+    print(leaderboard.to_string(index=False))